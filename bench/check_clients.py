@@ -0,0 +1,60 @@
+"""
+Offline check of the pooled clients in utils.clients: fetching an index and
+its stats through PineconeManager must return, not deadlock on the pool's
+lock. Runs against a stub Pinecone client, so no API key is needed.
+
+    python -m bench.check_clients
+"""
+import sys
+import threading
+from types import SimpleNamespace
+from unittest import mock
+from utils.clients import get_index
+from utils.pinecone_manager import PineconeManager
+
+TIMEOUT = 5
+
+class StubIndex:
+    def __init__(self, name):
+        self.name = name
+
+    def describe_index_stats(self):
+        return SimpleNamespace(dimension=8, total_vector_count=3,
+                               namespaces={'bench': SimpleNamespace(vector_count=3)})
+
+class StubPinecone:
+    def __init__(self, api_key):
+        self.api_key = api_key
+
+    def Index(self, name):
+        return StubIndex(name)
+
+    def list_indexes(self):
+        return [SimpleNamespace(name='bench', dimension=8)]
+
+def check():
+    """Returns the results of the pooled calls; they must hit the pool twice without blocking."""
+    index = get_index('check-clients', 'bench')
+    manager = PineconeManager('check-clients')
+    return {
+        'same_index': manager.connect_index('bench') is index,
+        'stats': manager.index_stats('bench'),
+        'indexes': manager.index_dimensions(),
+    }
+
+def main():
+    results = {}
+    with mock.patch('utils.clients.pinecone.Pinecone', StubPinecone):
+        worker = threading.Thread(target=lambda: results.update(check()), daemon=True)
+        worker.start()
+        worker.join(TIMEOUT)
+    if worker.is_alive():
+        print(f"Client pool did not return within {TIMEOUT}s (deadlock?)", file=sys.stderr)
+        sys.exit(1)
+    if not results.get('same_index') or results['stats']['dimension'] != 8:
+        print(f"Unexpected results: {results}", file=sys.stderr)
+        sys.exit(1)
+    print(results)
+
+if __name__ == "__main__":
+    main()
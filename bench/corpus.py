@@ -0,0 +1,52 @@
+import random
+
+TOPICS = [
+    "Hiring", "Onboarding", "Performance Reviews", "Workplace Harassment", "Remote Work",
+    "Overtime Pay", "Parental Leave", "Termination", "Employee Benefits", "Health and Safety",
+    "Pay Equity", "Accommodations", "Probation Periods", "Vacation Policy", "Conflict Resolution",
+]
+
+SECTIONS = [
+    "Overview", "Why it matters", "Legal requirements", "Best practices", "Steps to follow",
+    "Common mistakes", "Templates", "Frequently asked questions", "Related resources",
+]
+
+WORDS = (
+    "employee employer policy nonprofit organization manager staff legislation standards "
+    "workplace record compensation training review document process provincial notice "
+    "payroll contract team volunteer board leave request approval schedule safety "
+    "obligation consultation investigation complaint accommodation benefit"
+).split()
+
+DISCLAIMER = (
+    "The information on this page is for general guidance only and is not legal advice. "
+    "Contact a lawyer or your provincial employment standards office for advice on your situation."
+)
+
+def paragraph(rng, n_words):
+    words = [rng.choice(WORDS) for _ in range(n_words)]
+    return ' '.join(words).capitalize() + '.'
+
+def generate_article(seed, sections=6, words_per_section=120):
+    """
+    Generates a synthetic HR article in the scraped markdown layout (title first).
+
+    The same seed always produces the same article, so fake servers can serve
+    stable pages and embeddings.
+    """
+    rng = random.Random(seed)
+    title = f"{rng.choice(TOPICS)} {rng.choice(['Guide', 'Toolkit', 'Checklist', 'Policy'])} {seed}"
+    lines = [f"# {title}", ""]
+    for name in rng.sample(SECTIONS, min(sections, len(SECTIONS))):
+        lines += [f"## {name}", ""]
+        n_paragraphs = rng.randint(1, 3)
+        for _ in range(n_paragraphs):
+            lines += [paragraph(rng, max(5, words_per_section // n_paragraphs)), ""]
+        if rng.random() < 0.3:
+            lines += ["### Details", "", f"* **Note:** {paragraph(rng, 20)}", ""]
+    # Boilerplate repeated across pages, like the real site
+    lines += ["## Disclaimer", "", DISCLAIMER, ""]
+    return '\n'.join(lines)
+
+def generate_urls(pages, base_url="https://hrintervals.example/resource"):
+    return [f"{base_url}/article-{i}" for i in range(pages)]
@@ -0,0 +1,183 @@
+import json
+import time
+import base64
+import random
+import hashlib
+import threading
+import numpy as np
+from urllib.parse import urlparse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from bench.corpus import generate_article
+
+class ServiceProfile:
+    """
+    Behaviour of one fake API: response latency, a requests-per-minute limit
+    answered with 429s, and a rate of injected server errors.
+    """
+
+    def __init__(self, latency=0.05, jitter=0.5, requests_per_minute=None, error_rate=0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.requests_per_minute = requests_per_minute
+        self.error_rate = error_rate
+        self.requests = 0
+        self.throttled = 0
+        self.errors = 0
+        self._window = []
+        self._lock = threading.Lock()
+
+    def admit(self):
+        """Returns None if the request may proceed, otherwise seconds until it may be retried."""
+        with self._lock:
+            self.requests += 1
+            if not self.requests_per_minute:
+                return None
+            now = time.monotonic()
+            self._window = [t for t in self._window if now - t < 60]
+            if len(self._window) >= self.requests_per_minute:
+                self.throttled += 1
+                return 60 - (now - self._window[0])
+            self._window.append(now)
+            return None
+
+    def delay(self):
+        time.sleep(self.latency * (1 + random.uniform(-self.jitter, self.jitter)))
+
+    def fail(self):
+        if self.error_rate and random.random() < self.error_rate:
+            with self._lock:
+                self.errors += 1
+            return True
+        return False
+
+    def stats(self):
+        return {'requests': self.requests, 'throttled': self.throttled, 'errors': self.errors}
+
+
+class FakeServices:
+    """
+    Local stand-ins for the Firecrawl scrape, OpenAI embeddings and Pinecone
+    upsert endpoints, served from one threaded HTTP server.
+
+        with FakeServices() as fake:
+            Scrape(..., api_url=fake.firecrawl_url)
+            Embedder(..., base_url=fake.openai_url)
+            pinecone.Pinecone(api_key='bench').Index(host=fake.pinecone_host)
+    """
+
+    def __init__(self, firecrawl=None, openai=None, pinecone=None, sections=6, words_per_section=120):
+        self.profiles = {
+            'firecrawl': firecrawl or ServiceProfile(),
+            'openai': openai or ServiceProfile(),
+            'pinecone': pinecone or ServiceProfile(),
+        }
+        self.sections = sections
+        self.words_per_section = words_per_section
+        self.upserted = 0
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    @property
+    def firecrawl_url(self):
+        return self.base_url
+
+    @property
+    def openai_url(self):
+        return f'{self.base_url}/v1'
+
+    @property
+    def pinecone_host(self):
+        return self.base_url
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def stats(self):
+        return {name: profile.stats() for name, profile in self.profiles.items()}
+
+    def _scrape(self, body):
+        url = body['url']
+        seed = int(hashlib.sha1(url.encode('utf-8')).hexdigest()[:8], 16)
+        markdown = generate_article(seed, self.sections, self.words_per_section)
+        return {'success': True, 'data': {'markdown': markdown, 'metadata': {'url': url, 'statusCode': 200}}}
+
+    def _embed(self, body):
+        inputs = body['input'] if isinstance(body['input'], list) else [body['input']]
+        dimensions = body.get('dimensions') or 3072
+        vectors = np.random.default_rng().standard_normal((len(inputs), dimensions), dtype=np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        data = []
+        for i, vector in enumerate(vectors):
+            # The OpenAI client asks for base64 float32 unless a format is given explicitly
+            if body.get('encoding_format') == 'base64':
+                embedding = base64.b64encode(vector.tobytes()).decode('ascii')
+            else:
+                embedding = vector.tolist()
+            data.append({'object': 'embedding', 'index': i, 'embedding': embedding})
+        tokens = sum(len(text.split()) for text in inputs)
+        return {'object': 'list', 'data': data, 'model': body.get('model'),
+                'usage': {'prompt_tokens': tokens, 'total_tokens': tokens}}
+
+    def _upsert(self, body):
+        count = len(body.get('vectors', []))
+        self.upserted += count
+        return {'upsertedCount': count}
+
+    def _handler(self):
+        fake = self
+        routes = {
+            '/v1/scrape': ('firecrawl', fake._scrape),
+            '/v1/embeddings': ('openai', fake._embed),
+            '/vectors/upsert': ('pinecone', fake._upsert),
+        }
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, payload, headers=None):
+                data = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                body = json.loads(self.rfile.read(length) or b'{}')
+                route = routes.get(urlparse(self.path).path)
+                if route is None:
+                    self._send(404, {'error': f'unknown path {self.path}'})
+                    return
+
+                service, handle = route
+                profile = fake.profiles[service]
+                retry_after = profile.admit()
+                if retry_after is not None:
+                    self._send(429, {'error': {'message': 'Rate limit reached', 'type': 'rate_limit_error'}},
+                               {'retry-after': f'{retry_after:.3f}',
+                                'retry-after-ms': str(int(retry_after * 1000))})
+                    return
+                profile.delay()
+                if profile.fail():
+                    self._send(500, {'error': {'message': 'Injected server error', 'type': 'server_error'}})
+                    return
+                self._send(200, handle(body))
+
+        return Handler
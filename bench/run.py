@@ -0,0 +1,199 @@
+"""
+Offline throughput benchmark for the scrape, embed and upsert stages.
+
+Runs the real Scrape, Embedder and Upserter code against local stand-ins for
+Firecrawl, OpenAI and Pinecone (see bench/fake_servers.py), so no credits are
+spent and no network is needed.
+
+    python -m bench.run --pages 200 --latency 0.05 --openai-rpm 500
+    python -m bench.run --baseline bench_baseline.json --tolerance 0.2
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import contextlib
+import threading
+import resource
+import pinecone
+import tiktoken
+from bench.corpus import generate_urls
+from bench.fake_servers import FakeServices, ServiceProfile
+from utils.scrape import Scrape
+from utils.embedder import Embedder
+from utils.upsert import Upserter
+from utils.metrics import METRICS
+
+def current_rss():
+    """Resident set size in bytes, read from /proc where available."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    # ru_maxrss is KiB on Linux and bytes on macOS; it is a lifetime peak, not current usage
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class PeakRSS:
+    """Samples RSS on a background thread and records the peak seen inside the block."""
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+
+    def _sample(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, current_rss())
+            time.sleep(self.interval)
+
+    def __enter__(self):
+        self.peak = current_rss()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss())
+
+
+def offline_encoding():
+    """
+    Byte-level tiktoken encoding built in memory, so the benchmark needs no download.
+
+    Every byte is one token, so token counts run about four times those of
+    cl100k_base; runs stay comparable with each other, not with production.
+    """
+    return tiktoken.Encoding(
+        name='bench_bytes',
+        pat_str=r"\S+|\s+",
+        mergeable_ranks={bytes([i]): i for i in range(256)},
+        special_tokens={}
+    )
+
+def timed_stage(name, results, func):
+    with PeakRSS() as rss:
+        start = time.perf_counter()
+        count = func()
+        seconds = time.perf_counter() - start
+    results[name] = {
+        'items': count,
+        'seconds': round(seconds, 3),
+        'per_second': round(count / seconds, 1) if seconds else 0.0,
+        'peak_rss_mb': round(rss.peak / 2**20, 1),
+    }
+    return count
+
+
+def run(args):
+    results = {}
+    with FakeServices(
+        firecrawl=ServiceProfile(args.latency, requests_per_minute=args.firecrawl_rpm, error_rate=args.error_rate),
+        openai=ServiceProfile(args.latency, requests_per_minute=args.openai_rpm, error_rate=args.error_rate),
+        pinecone=ServiceProfile(args.latency, requests_per_minute=args.pinecone_rpm, error_rate=args.error_rate),
+        sections=args.sections,
+    ) as fake, tempfile.TemporaryDirectory() as workdir:
+        # The stages write ./pages and ./vectors relative to the working directory
+        cwd = os.getcwd()
+        os.chdir(workdir)
+        try:
+            with open('urls.txt', 'w') as f:
+                f.write('\n'.join(generate_urls(args.pages)))
+
+            scraper = Scrape(
+                'urls.txt', 'bench',
+                max_workers=args.scrape_workers,
+                requests_per_minute=args.scrape_rpm,
+                api_url=fake.firecrawl_url
+            )
+            scraper.extract_urls()
+            timed_stage('scrape_pages', results, lambda: len(scraper.urls) - len(scraper.scrape_websites()))
+
+            encoding = None if args.tiktoken else offline_encoding()
+            embedder = Embedder('bench', base_url=fake.openai_url, output_format=args.output_format,
+                                encoding=encoding)
+            texts = sorted(scraper.store.iter_texts())
+            state = {}
+
+            def chunk():
+                state['files'], state['doc_strings'] = embedder.split_texts(texts)
+                return len(state['doc_strings'])
+
+            def embed():
+                state['embeddings'] = embedder.embed_texts(state['doc_strings'])
+                embedder.write_files(state['files'], state['embeddings'])
+                return len(state['embeddings'])
+
+            timed_stage('chunk', results, chunk)
+            timed_stage('embed_chunks', results, embed)
+
+            index = pinecone.Pinecone(api_key='bench').Index(host=fake.pinecone_host)
+            upserter = Upserter(index, 'bench', max_workers=args.upsert_workers)
+            vectors = [vector for _, file_vectors in state['files'] for vector in file_vectors]
+            timed_stage('upsert_vectors', results, lambda: upserter.upsert(vectors))
+        finally:
+            os.chdir(cwd)
+        results['fake_services'] = fake.stats()
+    results['metrics'] = METRICS.report()
+    return results
+
+
+def check_baseline(results, baseline_path, tolerance):
+    """Returns the stages whose throughput fell more than `tolerance` below the baseline."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    regressions = []
+    for stage, expected in baseline.items():
+        if not isinstance(expected, dict) or 'per_second' not in expected or stage not in results:
+            continue
+        actual = results[stage]['per_second']
+        if actual < expected['per_second'] * (1 - tolerance):
+            regressions.append(f"{stage}: {actual}/s vs baseline {expected['per_second']}/s")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark for the scrape/embed/upsert stages.")
+    parser.add_argument('--pages', type=int, default=100, help="Synthetic articles to scrape")
+    parser.add_argument('--sections', type=int, default=6, help="Sections per article")
+    parser.add_argument('--latency', type=float, default=0.05, help="Mean fake API latency in seconds")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction of requests answered with a 500")
+    parser.add_argument('--firecrawl-rpm', type=int, default=None, help="Fake Firecrawl rate limit (429 above it)")
+    parser.add_argument('--openai-rpm', type=int, default=None, help="Fake OpenAI rate limit (429 above it)")
+    parser.add_argument('--pinecone-rpm', type=int, default=None, help="Fake Pinecone rate limit (429 above it)")
+    parser.add_argument('--scrape-workers', type=int, default=8)
+    parser.add_argument('--scrape-rpm', type=int, default=100000, help="Client-side scrape rate limit")
+    parser.add_argument('--upsert-workers', type=int, default=4)
+    parser.add_argument('--output-format', choices=['json', 'npy'], default='json')
+    parser.add_argument('--tiktoken', action='store_true',
+                        help="Count tokens with the model's real encoding (downloaded once) instead of the offline one")
+    parser.add_argument('--output', help="Write the JSON report to this file")
+    parser.add_argument('--baseline', help="Fail if throughput regresses against this earlier report")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="Allowed fractional slowdown vs baseline")
+    args = parser.parse_args()
+
+    # Keep the stages' progress output off stdout so the report can be piped
+    with contextlib.redirect_stdout(sys.stderr):
+        results = run(args)
+    report = json.dumps(results, indent=2)
+    print(report)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(report)
+
+    if args.baseline:
+        regressions = check_baseline(results, args.baseline, args.tolerance)
+        if regressions:
+            print("Throughput regressions:\n  " + "\n  ".join(regressions), file=sys.stderr)
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,30 +1,49 @@
-import json
 import streamlit as st
-import pinecone
-from tqdm import tqdm
-from typing import List, Dict
-
-class PineconeManager:
-    def __init__(self, api_key: str):
-        self.api_key = api_key
-        self.pinecone = pinecone.Pinecone(api_key=self.api_key)
-        
-    def list_indexes(self) -> List[str]:
-        try:
-            return self.pinecone.list_indexes().names()
-        except Exception as e:
-            st.error(f"Connection failed: {str(e)}")
-            st.stop()
-
-    def index_exists(self, index_name: str) -> bool:
-        return index_name in self.list_indexes()
-    
-    def connect_index(self, index_name: str):
-        try:
-            return self.pinecone.Index(index_name)
-        except pinecone.exceptions.NotFoundException:
-            st.error(f"Index '{index_name}' not found. Please create it first through Pinecone console.")
-            st.stop()
+import numpy as np
+from typing import List, Dict, Iterator
+from utils.pinecone_manager import PineconeManager
+from utils.sync import sync_articles
+from utils.upsert import Upserter
+from utils.metrics import Metrics
+from utils.stream_json import iter_json_array
+from utils.validate import validate_sources, PROBLEMS
+from utils.vector_store import VALUES_SUFFIX, META_SUFFIX, is_values_file, iter_vectors, load_values
+
+# One namespace per vector size, e.g. the 1024-dimensional chunks in SIMPLE-SPLIT-large-1024
+NAMESPACE_TEMPLATE = "SIMPLE-SPLIT-large-{dimension}"
+
+def group_uploads(uploaded_files) -> List[Dict]:
+    """
+    Groups uploads into vector sources: JSON files on their own and
+    `.npy` matrices paired with their `.meta.jsonl` metadata tables.
+
+    Only float32 matrices are accepted: float16 and int8 exports are for
+    local search, and upserting them would put lossy vectors in Pinecone
+    with nothing to rescore against.
+    """
+    by_name = {f.name: f for f in uploaded_files}
+    sources = []
+    for f in uploaded_files:
+        if f.name.endswith('.json'):
+            sources.append({'name': f.name, 'json': f})
+        elif is_values_file(f.name):
+            stem = f.name[:-len(VALUES_SUFFIX)]
+            meta_name = stem + META_SUFFIX
+            if meta_name not in by_name:
+                raise ValueError(f"Missing metadata table '{meta_name}' for '{f.name}'")
+            dtype = load_values(f).dtype
+            if dtype != np.float32:
+                raise ValueError(f"'{f.name}' holds {dtype} vectors; only float32 exports can be upserted. "
+                                 f"Export with the float32 vector precision.")
+            sources.append({'name': f.name, 'npy': f, 'meta': by_name[meta_name]})
+    return sources
+
+def iter_source(source) -> Iterator[Dict]:
+    """Streams the vectors of an upload source without loading the whole file."""
+    if 'json' in source:
+        source['json'].seek(0)
+        return iter_json_array(source['json'])
+    return iter_vectors(source['npy'], source['meta'])
 
 footer = """
 <style>
@@ -62,16 +81,48 @@ def main():
         st.header("Step 1: Upload Files and API Key")
         
         uploaded_files = st.file_uploader(
-            "Upload JSON embedding files", 
-            type="json",
+            "Upload embedding files (JSON, or .npy with its .meta.jsonl)", 
+            type=["json", "npy", "jsonl"],
             accept_multiple_files=True
         )
         
         pinecone_key = st.text_input("Pinecone API Key", type="password")
         
         if uploaded_files and pinecone_key:
+            try:
+                sources = group_uploads(uploaded_files)
+            except ValueError as e:
+                st.error(str(e))
+                st.stop()
+
+            # Validate every vector before any network call, once per set of uploads
+            upload_key = tuple((f.name, f.size) for f in uploaded_files)
+            if st.session_state.get('validated_uploads') != upload_key:
+                try:
+                    st.session_state.validation = validate_sources(sources)
+                except ValueError as e:
+                    st.error(str(e))
+                    st.stop()
+                st.session_state.validated_uploads = upload_key
+            report = st.session_state.validation
+            if not report['ok']:
+                st.session_state.pop('step1_complete', None)
+                st.error("The uploads contain invalid vectors. Nothing has been sent to Pinecone; fix the files and upload them again.")
+                st.table([
+                    {
+                        'problem': problem.replace('_', ' '),
+                        'vectors': report[problem]['count'],
+                        'examples': ', '.join(f'{name}: {vector_id}' for name, vector_id in report[problem]['examples'])
+                    }
+                    for problem in PROBLEMS if report[problem]['count']
+                ])
+                st.stop()
+            dimensions = sorted(set(report['dimensions'].values()))
+            st.caption(f"Validated {report['vectors']} vectors of {', '.join(map(str, dimensions))} dimensions "
+                       f"in {report['seconds']}s")
+
             st.session_state.step1_complete = True
-            st.session_state.uploaded_files = uploaded_files
+            st.session_state.uploaded_files = sources
             st.session_state.pinecone_key = pinecone_key
             st.success("Files and API key received. Proceed to Step 2.")
 
@@ -82,32 +133,53 @@ def main():
             
             try:
                 pc = PineconeManager(st.session_state.pinecone_key)
-                indexes = pc.list_indexes()
+                index_dimensions = pc.index_dimensions()
                 
-                if not indexes:
+                if not index_dimensions:
                     st.warning("No indexes found in your Pinecone project. Please create an index first through Pinecone console.")
                     st.stop()
-                
-                col1, col2 = st.columns(2)
-                with col1:
-                    index_name = st.selectbox(
-                        "Select Pinecone index:",
-                        options=indexes,
-                        index=0
-                    )
-                with col2:
-                    namespace = st.text_input("Namespace:", disabled=True, 
-                                              value="SIMPLE-SPLIT-large-1024")
+
+                # A Pinecone index holds one dimension, so each size of the uploads gets its own index
+                routes = {}
+                for dimension in sorted(set(st.session_state.validation['dimensions'].values())):
+                    matching = [name for name, d in index_dimensions.items() if d == dimension]
+                    if not matching:
+                        st.error(f"No index with {dimension} dimensions found. Please create one through "
+                                 f"Pinecone console for the {dimension}-dimensional uploads.")
+                        st.stop()
+
+                    col1, col2 = st.columns(2)
+                    with col1:
+                        index_name = st.selectbox(
+                            f"Pinecone index for {dimension}-dimensional vectors:",
+                            options=matching,
+                            index=0,
+                            key=f'index_{dimension}'
+                        )
+                    with col2:
+                        namespace = st.text_input("Namespace:", disabled=True, key=f'namespace_{dimension}',
+                                                  value=NAMESPACE_TEMPLATE.format(dimension=dimension))
+
+                    stats = pc.index_stats(index_name)
+                    st.caption(f"Vectors: {stats['total_vector_count']} "
+                               f"· In this namespace: {stats['namespaces'].get(namespace, 0)}")
+                    routes[dimension] = {'index_name': index_name, 'namespace': namespace}
+
+                sync_mode = st.checkbox(
+                    "Sync mode: upsert only new or changed chunks and delete stale chunks of the uploaded articles",
+                    value=True
+                )
+                max_workers = st.number_input("Parallel upsert requests", min_value=1, max_value=32, value=4)
                 
                 if st.button("Connect to Pinecone"):
-                    if not pc.index_exists(index_name):
-                        st.error(f"Index '{index_name}' does not exist. Please create it first through Pinecone console.")
-                        st.stop()
-                        
-                    st.session_state.pc_index = pc.connect_index(index_name)
-                    st.session_state.namespace = namespace
+                    for route in routes.values():
+                        route['index'] = pc.connect_index(route['index_name'])
+
+                    st.session_state.routes = routes
+                    st.session_state.sync_mode = sync_mode
+                    st.session_state.max_workers = int(max_workers)
                     st.session_state.step2_complete = True
-                    st.success(f"Connected to index: {index_name}")
+                    st.success(f"Connected to index: {', '.join(sorted({r['index_name'] for r in routes.values()}))}")
                     
             except Exception as e:
                 st.error(f"Connection failed: {str(e)}")
@@ -119,16 +191,23 @@ def main():
             st.header("Step 3: Vector Upsert")
             
             if st.button("Start Upsert Process"):
-                pc_index = st.session_state.pc_index
-                namespace = st.session_state.namespace
+                routes = st.session_state.routes
+                source_dimensions = st.session_state.validation['dimensions']
+                sync_mode = st.session_state.sync_mode
                 total_files = len(st.session_state.uploaded_files)
                 
                 progress_bar = st.progress(0)
                 status = st.status("Initializing upsert process...", expanded=True)
-                total_vectors = 0
+                total_deleted = 0
+                metrics = Metrics()
+                upserters = {
+                    dimension: Upserter(route['index'], route['namespace'], max_workers=st.session_state.max_workers,
+                                        metrics=metrics)
+                    for dimension, route in routes.items()
+                }
 
                 with status:
-                    for i, uploaded_file in enumerate(st.session_state.uploaded_files):
+                    for i, source in enumerate(st.session_state.uploaded_files):
                         # Update progress
                         progress = (i + 1) / total_files
                         progress_bar.progress(progress)
@@ -136,36 +215,53 @@ def main():
                             label=f"Processing files... ({int(progress*100)}%)",
                             state="running"
                         )
+                        dimension = source_dimensions[source['name']]
+                        route = routes[dimension]
                         
-                        # Load and validate vectors
+                        # Stream vectors straight into upsert batches
                         try:
-                            data = json.load(uploaded_file)
-                            if not isinstance(data, list):
-                                raise ValueError("Invalid JSON format - expected array of vectors")
-                                
-                            # Upsert vectors
-                            batch_size = 100
-                            for i in tqdm(range(0, len(data), batch_size)):
-                                batch = data[i:i+batch_size]
-                                pc_index.upsert(
-                                    vectors=batch,
-                                    namespace=namespace
-                                )
-                            
-                            total_vectors += len(data)
-                            status.write(f"Processed {uploaded_file.name} ({len(data)} vectors)")
+                            stats = {'upserted': 0, 'deleted': 0, 'unchanged': 0}
+                            vectors = iter_source(source)
+                            if sync_mode:
+                                vectors = sync_articles(route['index'], route['namespace'], vectors, stats)
+
+                            # Upsert vectors in payload-sized batches, several at a time
+                            stats['upserted'] = upserters[dimension].upsert(vectors)
+                            total_deleted += stats['deleted']
+                            if sync_mode:
+                                status.write(f"Synced {source['name']} into {route['namespace']} "
+                                             f"({stats['upserted']} upserted, {stats['unchanged']} unchanged, "
+                                             f"{stats['deleted']} deleted)")
+                            else:
+                                status.write(f"Processed {source['name']} into {route['namespace']} "
+                                             f"({stats['upserted']} vectors)")
                             
                         except Exception as e:
-                            status.error(f"Error in {uploaded_file.name}: {str(e)}")
+                            status.error(f"Error in {source['name']}: {str(e)}")
                             st.stop()
                 
                     # Final status
                     progress_bar.progress(100)
+                    upserted = sum(upserter.upserted for upserter in upserters.values())
+                    seconds = sum(upserter.elapsed for upserter in upserters.values())
+                    failed = [error for upserter in upserters.values() for error in upserter.failed]
+                    if failed:
+                        status.error(f"{sum(len(batch) for batch, _ in failed)} vectors failed after retries: "
+                                     f"{failed[0][1]}")
                     status.update(
-                        label=f"Upsert completed! Total vectors: {total_vectors}",
-                        state="complete",
-                        expanded=False
+                        label=f"Upsert completed! Total vectors: {upserted}, deleted: {total_deleted} "
+                              f"({round(upserted / seconds, 1) if seconds else 0.0} vectors/s)",
+                        state="error" if failed else "complete",
+                        expanded=bool(failed)
                     )
 
+                # Vector counts shown in Step 2 are stale now
+                pc = PineconeManager(st.session_state.pinecone_key)
+                for route in routes.values():
+                    pc.invalidate(route['index_name'])
+
+                with st.expander("Run metrics"):
+                    st.json(metrics.report())
+
 if __name__ == "__main__":
     main()
@@ -1,14 +1,25 @@
 import os
+import asyncio
+import hashlib
 import streamlit as st
-from zipfile import ZipFile
-from utils.embedder import Embedder
+from utils.async_embedder import AsyncEmbedder
+from utils.cache import EmbeddingCache
+from utils.journal import EmbeddingJournal
+from utils.metrics import Metrics
+from utils.misc import IncrementalZip, run_archive_path
+from utils.dedup import DEFAULT_THRESHOLD
 
-def create_zip(json_files):
-    zip_path = "embeddings.zip"
-    with ZipFile(zip_path, 'w') as zipf:
-        for file in json_files:
-            zipf.write(file, os.path.basename(file))
-    return zip_path
+@st.cache_resource
+def get_embedding_cache():
+    # One cache connection shared by every session of the app
+    return EmbeddingCache()
+
+def job_journal(uploaded_files):
+    """Journal of the job embedding exactly these files, reopened if an earlier run of it failed."""
+    digest = hashlib.sha1()
+    for f in sorted(uploaded_files, key=lambda f: f.name):
+        digest.update(f.name.encode('utf-8') + b'\x00' + f.getvalue())
+    return EmbeddingJournal(f"./cache/journals/{digest.hexdigest()}.jsonl")
 
 footer = """
 <style>
@@ -52,6 +63,51 @@ def main():
         )
         
         api_key = st.text_input("OpenAI API Key", type="password")
+        use_cache = st.checkbox("Reuse cached embeddings for unchanged chunks", value=True)
+        dedup = st.checkbox(
+            "Embed repeated sections once",
+            value=True,
+            help="Boilerplate sections shared by several articles become one vector listing every source URL"
+        )
+        output_format = st.radio(
+            "Output format",
+            options=["json", "npy"],
+            format_func=lambda f: "JSON" if f == "json" else "Compact binary (.npy + .meta.jsonl)",
+            horizontal=True
+        )
+        vector_dtype = st.selectbox(
+            "Vector precision",
+            options=["float32", "float16", "int8"],
+            help="float16 halves and int8 quarters the size of the .npy matrix. Quantized exports are for "
+                 "local search only; the Pinecone ingest app accepts float32 exports",
+            disabled=output_format != "npy"
+        )
+        output_dimensions = st.multiselect(
+            "Output dimensions",
+            options=[256, 512, 1024],
+            default=[1024],
+            help="Embeds once at the largest size and derives the smaller ones; "
+                 "each size is written as <article>-<dimensions> for its own index"
+        )
+
+        with st.expander("Chunk sizing"):
+            size_chunks = st.checkbox("Merge short sections and split long ones", value=True)
+            col1, col2 = st.columns(2)
+            with col1:
+                chunk_tokens = st.number_input("Target tokens per chunk", min_value=64, max_value=8191, value=512,
+                                               disabled=not size_chunks)
+            with col2:
+                chunk_overlap = st.number_input("Overlap tokens when splitting", min_value=0, max_value=1024, value=64,
+                                                disabled=not size_chunks)
+
+        with st.expander("Rate limits"):
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                max_concurrency = st.number_input("Requests in flight", min_value=1, value=8)
+            with col2:
+                requests_per_minute = st.number_input("Requests per minute", min_value=1, value=3000)
+            with col3:
+                tokens_per_minute = st.number_input("Tokens per minute", min_value=1, value=1_000_000)
         
         if uploaded_files and api_key:
             st.session_state.step1_complete = True
@@ -66,32 +122,72 @@ def main():
                 if not api_key:
                     st.error("Please enter your OpenAI API key")
                     return
+                if not output_dimensions:
+                    st.error("Select at least one output dimension")
+                    return
+                if size_chunks and chunk_overlap >= chunk_tokens:
+                    st.error("Overlap must be smaller than the target tokens per chunk")
+                    return
                 
-                embedder = Embedder(api_key)
+                cache = get_embedding_cache() if use_cache else None
+                journal = job_journal(uploaded_files)
+                # Per-run metrics, so concurrent sessions do not mix their numbers
+                metrics = Metrics()
+                embedder = AsyncEmbedder(
+                    api_key,
+                    metrics=metrics,
+                    cache=cache,
+                    max_concurrency=int(max_concurrency),
+                    requests_per_minute=int(requests_per_minute),
+                    tokens_per_minute=int(tokens_per_minute),
+                    output_format=output_format,
+                    vector_dtype=vector_dtype,
+                    dedup_threshold=DEFAULT_THRESHOLD if dedup else None,
+                    chunk_tokens=int(chunk_tokens) if size_chunks else None,
+                    chunk_overlap=int(chunk_overlap),
+                    journal=journal,
+                    dimensions=max(output_dimensions),
+                    output_dimensions=output_dimensions if len(output_dimensions) > 1 else None
+                )
                 progress_bar = st.progress(0)
                 status = st.status("Initializing embedding process...", expanded=True)
-                
+
+                def on_progress(completed, total):
+                    progress_percent = int(completed / total * 100)
+                    progress_bar.progress(progress_percent)
+                    status.update(
+                        label=f"Embedding batches... ({progress_percent}%)",
+                        state="running",
+                        expanded=True
+                    )
+
                 try:
                     with status:
-                        json_files = []
-                        total_files = len(uploaded_files)
-                        
-                        for i, file in enumerate(uploaded_files):
-                            # Calculate progress percentage
-                            progress_percent = int((i + 1) / total_files * 100)
-                            progress_bar.progress(progress_percent)
-                            
-                            # Update status with current file and percentage
-                            status.update(
-                                label=f"Processing files... ({progress_percent}%)",
-                                state="running",
-                                expanded=True
-                            )
-                            status.write(f"Current file: {file.name}")
-                            
-                            # Process the file
-                            json_files += embedder.process_md_files([file])
+                        status.write(f"Splitting {len(uploaded_files)} files")
+                        if len(journal):
+                            status.write(f"Resuming an interrupted run: {len(journal)} chunks already embedded")
+
+                        # Embed all files together so batches run concurrently across files;
+                        # each output file is zipped as soon as it is written, into an archive
+                        # of this run's own so concurrent sessions never share a file
+                        st.session_state.pop('embedding_done', None)
+                        st.session_state.zip_path = run_archive_path("embeddings.zip",
+                                                                     st.session_state.get('zip_path'))
+                        with IncrementalZip(st.session_state.zip_path) as archive:
+                            asyncio.run(embedder.aprocess_md_files(
+                                uploaded_files,
+                                on_progress=on_progress,
+                                on_written=lambda path: archive.add(path, os.path.basename(path))
+                            ))
                         
+                        if dedup:
+                            status.write(f"Duplicate chunks skipped: {metrics.counter('duplicate_chunks_total')}")
+                        if cache is not None:
+                            # This run's counters; the cache's own stats are shared by every session
+                            hits = metrics.counter('embedding_cache_hits_total')
+                            lookups = metrics.counter('embedding_cache_lookups_total')
+                            status.write(f"Cache hits: {hits}, misses: {lookups - hits}")
+
                         # Final completion message
                         progress_bar.progress(100)
                         status.update(
@@ -100,15 +196,20 @@ def main():
                             expanded=False
                         )
                         
-                        # Create ZIP file
-                        zip_path = create_zip(json_files)
-                        st.session_state.zip_path = zip_path
                         st.session_state.embedding_done = True
+                        st.session_state.metrics_report = metrics.report()
                         
                 except Exception as e:
-                    st.error(f"Error during embedding: {str(e)}")
+                    # The journal keeps every finished batch; running again resumes from there
+                    if embedder.journal is not None:
+                        embedder.journal.close()
+                    st.error(f"Error during embedding: {str(e)}. Start again to resume from the last finished batch.")
                     return
 
+        if 'metrics_report' in st.session_state:
+            with st.expander("Run metrics"):
+                st.json(st.session_state.metrics_report)
+
         # Download Section
         if 'embedding_done' in st.session_state:
             with st.container(border=True):
@@ -119,8 +220,11 @@ def main():
                         label="Download Embeddings ZIP",
                         data=f,
                         file_name="embeddings.zip",
-                        mime="application/zip"
+                        mime="application/zip",
+                        on_click="ignore"
                     )
+                # st.download_button holds the whole archive in memory; large runs can copy it from disk instead
+                st.caption(f"The archive is also on the server at {os.path.abspath(st.session_state.zip_path)}")
 
 if __name__ == "__main__":
     main()
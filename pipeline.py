@@ -0,0 +1,271 @@
+"""
+Headless scrape -> embed -> upsert pipeline.
+
+Pages stream through bounded queues, so a page is embedded and upserted
+while later URLs are still being scraped. API keys default to the
+FIRECRAWL_API_KEY, OPENAI_API_KEY and PINECONE_API_KEY environment
+variables (a .env file is honored).
+
+    python pipeline.py --urls urls.txt --index hr-intervals --sync
+"""
+import os
+import sys
+import json
+import time
+import queue
+import argparse
+import threading
+from dotenv import load_dotenv
+from utils.scrape import Scrape
+from utils.page_store import PageStore
+from utils.embedder import Embedder
+from utils.cache import EmbeddingCache
+from utils.journal import EmbeddingJournal
+from utils.pinecone_manager import PineconeManager
+from utils.sync import sync_articles
+from utils.upsert import Upserter
+from utils.metrics import METRICS
+
+DONE = object()
+
+def put(q, item, stop):
+    """Blocks on a full queue until there is room or the pipeline is stopping."""
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.5)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+def iter_queue(q):
+    while True:
+        item = q.get()
+        if item is DONE:
+            return
+        yield item
+
+
+class Pipeline:
+    def __init__(self, scraper, embedder, index, namespace, sync=False, queue_size=32,
+                 pages_per_batch=16, upsert_workers=4):
+        self.scraper = scraper
+        # Pages enter the manifest only after the whole run reached Pinecone (see run)
+        self.scraper.defer_manifest = True
+        self.embedder = embedder
+        self.index = index
+        self.namespace = namespace
+        self.sync = sync
+        self.pages_per_batch = pages_per_batch
+        self.upserter = Upserter(index, namespace, max_workers=upsert_workers)
+        self.pages = queue.Queue(maxsize=queue_size)
+        self.vectors = queue.Queue(maxsize=queue_size * 64)
+        self.stop = threading.Event()
+        self.errors = []
+        self.timings = {}
+        self.sync_stats = {'deleted': 0, 'unchanged': 0}
+        self.embedded = 0
+
+    def _run_stage(self, name, target, output):
+        start = time.perf_counter()
+        try:
+            target()
+        except Exception as e:
+            self.errors.append((name, e))
+            self.stop.set()
+            self.scraper.cancel()
+        finally:
+            self.timings[name] = round(time.perf_counter() - start, 2)
+            if output is not None:
+                self._finish(output)
+
+    def _finish(self, output):
+        # Always release the next stage, even after a failure
+        while True:
+            try:
+                output.put(DONE, timeout=0.5)
+                return
+            except queue.Full:
+                if self.stop.is_set():
+                    # The consumer may have stopped already; discard backlog to make room
+                    try:
+                        output.get_nowait()
+                    except queue.Empty:
+                        pass
+
+    def _scrape(self):
+        def on_page(url, name):
+            put(self.pages, name, self.stop)
+        self.scraper.scrape_websites(on_page=on_page)
+
+    def _embed_batch(self, names):
+        # One pass over the shards for the whole batch
+        texts = list(self.scraper.store.iter_texts(names))
+        files, doc_strings = self.embedder.split_texts(texts)
+        embeddings = self.embedder.embed_texts(doc_strings)
+        self.embedder.write_files(files, embeddings)
+        for _, vectors in files:
+            for vector in vectors:
+                if not put(self.vectors, vector, self.stop):
+                    return
+            self.embedded += len(vectors)
+
+    def _embed(self):
+        # Group pages so one embedding request covers several of them
+        batch = []
+        while True:
+            try:
+                item = self.pages.get(timeout=1.0 if batch else None)
+            except queue.Empty:
+                item = None
+            if item is not None and item is not DONE:
+                batch.append(item)
+            if batch and (item is None or item is DONE or len(batch) >= self.pages_per_batch):
+                self._embed_batch(batch)
+                batch = []
+            if item is DONE or self.stop.is_set():
+                return
+
+    def _upsert(self):
+        vectors = iter_queue(self.vectors)
+        if self.sync:
+            vectors = sync_articles(self.index, self.namespace, vectors, self.sync_stats)
+        self.upserter.upsert(vectors)
+
+    def run(self):
+        stages = [
+            threading.Thread(target=self._run_stage, args=('scrape', self._scrape, self.pages)),
+            threading.Thread(target=self._run_stage, args=('embed', self._embed, self.vectors)),
+            threading.Thread(target=self._run_stage, args=('upsert', self._upsert, None)),
+        ]
+        start = time.perf_counter()
+        for stage in stages:
+            stage.start()
+        for stage in stages:
+            stage.join()
+        self.timings['total'] = round(time.perf_counter() - start, 2)
+
+        # Drain whatever a failed stage left behind so no thread stays blocked
+        for q in (self.pages, self.vectors):
+            while not q.empty():
+                q.get_nowait()
+        # Changed pages only count as current once they reached the index; after a failure
+        # the next run sees them as changed again and re-embeds them (through the journal)
+        if not self.errors and not self.upserter.failed:
+            self.scraper.commit_pages()
+        return not self.errors and not self.scraper.failed and not self.upserter.failed
+
+    def report(self):
+        return {
+            'pages_scraped': len(self.scraper.changed),
+            'pages_skipped': len(self.scraper.skipped),
+            'pages_failed': len(self.scraper.failed),
+            'vectors_embedded': self.embedded,
+            **self.upserter.stats(),
+            **self.sync_stats,
+            'timings': self.timings,
+            'errors': [f'{name}: {e}' for name, e in self.errors],
+            'metrics': METRICS.report(),
+        }
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Scrape, embed and upsert HR articles without the Streamlit tools.")
+    parser.add_argument('--urls', required=True, help="Text file with one URL per line")
+    parser.add_argument('--index', required=True, help="Pinecone index name")
+    parser.add_argument('--namespace', default='SIMPLE-SPLIT-large-1024')
+    parser.add_argument('--firecrawl-key', default=os.getenv('FIRECRAWL_API_KEY'))
+    parser.add_argument('--openai-key', default=os.getenv('OPENAI_API_KEY'))
+    parser.add_argument('--pinecone-key', default=os.getenv('PINECONE_API_KEY'))
+    parser.add_argument('--scrape-workers', type=int, default=4)
+    parser.add_argument('--requests-per-minute', type=int, default=10, help="Firecrawl rate limit")
+    parser.add_argument('--freshness-hours', type=float, default=0, help="Skip URLs scraped within this window")
+    parser.add_argument('--pages', default='./pages', help="Directory of the compressed page store")
+    parser.add_argument('--upsert-workers', type=int, default=4)
+    parser.add_argument('--queue-size', type=int, default=32, help="Pages buffered between stages")
+    parser.add_argument('--pages-per-batch', type=int, default=16, help="Pages embedded together")
+    parser.add_argument('--output-format', choices=['json', 'npy'], default='json')
+    parser.add_argument('--vector-dtype', choices=['float32', 'float16', 'int8'], default='float32',
+                        help="Precision of npy output")
+    parser.add_argument('--no-cache', action='store_true', help="Do not reuse cached embeddings")
+    parser.add_argument('--journal', help="Checkpoint embedded batches to this file so a failed run resumes "
+                                          "without re-embedding; deleted after a successful run")
+    parser.add_argument('--chunk-tokens', type=int, default=None,
+                        help="Merge small header sections and split large ones towards this many tokens")
+    parser.add_argument('--chunk-overlap', type=int, default=0, help="Tokens shared by the parts of a split section")
+    parser.add_argument('--dedup-threshold', type=float, default=None,
+                        help="Embed near-duplicate chunks of a batch once (e.g. 0.85 Jaccard similarity)")
+    parser.add_argument('--sync', action='store_true',
+                        help="Upsert only new or changed chunks and delete stale ones")
+    parser.add_argument('--metrics-report', help="Also write the JSON run report to this file")
+    parser.add_argument('--metrics-port', type=int, help="Serve Prometheus metrics on this port during the run")
+    args = parser.parse_args()
+
+    for name in ('firecrawl_key', 'openai_key', 'pinecone_key'):
+        if not getattr(args, name):
+            parser.error(f"--{name.replace('_', '-')} is required (or set it in the environment)")
+
+    if args.metrics_port:
+        METRICS.serve(args.metrics_port)
+
+    scraper = Scrape(
+        file_path=args.urls,
+        api_key=args.firecrawl_key,
+        max_workers=args.scrape_workers,
+        requests_per_minute=args.requests_per_minute,
+        freshness_hours=args.freshness_hours,
+        store=PageStore(args.pages)
+    )
+    if not scraper.extract_urls():
+        sys.exit(1)
+
+    embedder = Embedder(
+        args.openai_key,
+        cache=None if args.no_cache else EmbeddingCache(),
+        output_format=args.output_format,
+        vector_dtype=args.vector_dtype,
+        dedup_threshold=args.dedup_threshold,
+        chunk_tokens=args.chunk_tokens,
+        chunk_overlap=args.chunk_overlap,
+        journal=EmbeddingJournal(args.journal) if args.journal else None,
+        # Pages arrive a few at a time, so chunk inline rather than forking a pool per batch
+        chunk_workers=1
+    )
+
+    pc = PineconeManager(args.pinecone_key)
+    if not pc.index_exists(args.index):
+        parser.error(f"Index '{args.index}' does not exist. Please create it first through Pinecone console.")
+    try:
+        # Fail before scraping anything rather than on the first upsert
+        pc.check_dimension(args.index, embedder.dimensions)
+    except ValueError as e:
+        parser.error(str(e))
+
+    pipeline = Pipeline(
+        scraper,
+        embedder,
+        pc.connect_index(args.index),
+        args.namespace,
+        sync=args.sync,
+        queue_size=args.queue_size,
+        pages_per_batch=args.pages_per_batch,
+        upsert_workers=args.upsert_workers
+    )
+    ok = pipeline.run()
+    scraper.store.close()
+    if embedder.journal is not None:
+        if ok:
+            embedder.journal.discard()
+        else:
+            embedder.journal.close()
+
+    report = json.dumps(pipeline.report(), indent=2)
+    print(report)
+    if args.metrics_report:
+        with open(args.metrics_report, 'w') as f:
+            f.write(report)
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
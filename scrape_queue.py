@@ -0,0 +1,83 @@
+"""
+Scrape through a durable SQLite job queue shared by several workers.
+
+Queue the URLs once, then start as many workers as needed, in separate
+processes or on machines sharing the queue file. Each URL's state, attempts
+and last error are kept, so only the failures need another run. The
+Firecrawl key defaults to FIRECRAWL_API_KEY (a .env file is honored).
+
+    python scrape_queue.py add urls.txt
+    python scrape_queue.py work --workers 4 &
+    python scrape_queue.py work --workers 4 &
+    python scrape_queue.py status
+    python scrape_queue.py retry-failed
+"""
+import os
+import sys
+import json
+import argparse
+from dotenv import load_dotenv
+from utils.scrape import Scrape, read_urls
+from utils.job_queue import JobQueue
+from utils.page_store import PageStore
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Multi-worker scraping from a shared SQLite job queue.")
+    parser.add_argument('--queue', default='./cache/jobs.sqlite', help="Queue database shared by the workers")
+    parser.add_argument('--lease-seconds', type=float, default=600,
+                        help="A claimed URL returns to the queue if its worker has not finished by then")
+    parser.add_argument('--max-attempts', type=int, default=3, help="Attempts before a URL is marked failed")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    add = commands.add_parser('add', help="Queue the URLs of a text file (one per line)")
+    add.add_argument('urls')
+
+    work = commands.add_parser('work', help="Scrape queued URLs until none are left")
+    work.add_argument('--firecrawl-key', default=os.getenv('FIRECRAWL_API_KEY'))
+    work.add_argument('--workers', type=int, default=4, help="Threads in this process")
+    work.add_argument('--requests-per-minute', type=int, default=10, help="Firecrawl rate limit of this process")
+    work.add_argument('--freshness-hours', type=float, default=0, help="Skip URLs scraped within this window")
+    work.add_argument('--worker-id', help="Lease owner name, defaults to host:pid")
+    work.add_argument('--pages', default='./pages', help="Page store directory shared by the workers")
+
+    commands.add_parser('status', help="Print the number of URLs in each state and the failures")
+    commands.add_parser('retry-failed', help="Queue every failed URL again")
+    args = parser.parse_args()
+
+    job_queue = JobQueue(args.queue, lease_seconds=args.lease_seconds, max_attempts=args.max_attempts)
+
+    if args.command == 'add':
+        try:
+            urls = read_urls(args.urls)
+        except FileNotFoundError:
+            parser.error(f"File '{args.urls}' not found")
+        print(f"Queued {job_queue.add(urls)} new URLs ({len(urls)} in file)")
+
+    elif args.command == 'work':
+        if not args.firecrawl_key:
+            parser.error("--firecrawl-key is required (or set it in the environment)")
+        scraper = Scrape(
+            None,
+            api_key=args.firecrawl_key,
+            max_workers=args.workers,
+            requests_per_minute=args.requests_per_minute,
+            freshness_hours=args.freshness_hours,
+            store=PageStore(args.pages)
+        )
+        scraper.scrape_queue(job_queue, worker_id=args.worker_id)
+        scraper.store.close()
+        # Attempts that failed but were retried do not count; only URLs out of attempts do
+        sys.exit(1 if job_queue.counts()['failed'] else 0)
+
+    elif args.command == 'status':
+        print(json.dumps({
+            'counts': job_queue.counts(),
+            'failed': [{'url': url, 'error': error} for url, error in job_queue.failures()]
+        }, indent=2))
+
+    elif args.command == 'retry-failed':
+        print(f"Re-queued {job_queue.retry_failed()} failed URLs")
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,30 @@
 import streamlit as st
-import streamlit.components.v1 as components
 import os
+import json
 import time
-import sys
 import threading
 import queue
-import base64
+from collections import deque
 from utils.scrape import Scrape
-from utils.misc import StdoutCapture, download_zip
+from utils.metrics import Metrics
+from utils.events import PageDone, PageFailed, Throttled, describe
+from utils.misc import IncrementalZip, run_archive_path
+from utils.page_store import page_text
 
-def download(file_name):
-    components.html(
-        download_zip(file_name),
-        height=0
-    )
+# Progress log shown while scraping: only the latest lines, redrawn at most twice a second
+LOG_LINES = 50
+RENDER_INTERVAL = 0.5
+
+def add_page(archive, store, key):
+    """Adds a stored page (by name or URL) to the archive as markdown and its JSON response, read straight from the store."""
+    if key not in store:
+        return
+    record = store.get(key)
+    md_name = f"md/{record['name']}"
+    if md_name in archive.names:
+        return
+    archive.writestr(md_name, page_text(record))
+    archive.writestr(f"json/{record['name'][:-len('.md')]}.json", json.dumps(record['response'], separators=(',', ':')))
 
 footer = """
 <style>
@@ -67,6 +78,22 @@ def main():
             
             st.success(f"File uploaded successfully!")
         
+        with st.expander("Rate limits"):
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                max_workers = st.number_input("Parallel workers", min_value=1, value=4)
+            with col2:
+                requests_per_minute = st.number_input("Firecrawl requests per minute", min_value=1, value=10)
+            with col3:
+                max_retries = st.number_input("Retries per URL", min_value=0, value=3)
+
+        with st.expander("Incremental refresh"):
+            freshness_hours = st.number_input(
+                "Skip URLs scraped within the last N hours (0 re-scrapes everything)",
+                min_value=0.0, value=0.0
+            )
+            only_changed = st.checkbox("Download only pages that changed since the last scrape", value=False)
+        
         proceed = st.button("Proceed to Scraping", disabled=(not api_key or uploaded_file is None))
     
     # Step 2: Scraping Process
@@ -75,7 +102,15 @@ def main():
         st.header("Step 2: Scraping Websites")
         
         # Initialize the scraper
-        scraper = Scrape(file_path="temp_urls.txt", api_key=api_key)
+        scraper = Scrape(
+            file_path="temp_urls.txt",
+            api_key=api_key,
+            max_workers=int(max_workers),
+            requests_per_minute=int(requests_per_minute),
+            max_retries=int(max_retries),
+            freshness_hours=freshness_hours,
+            metrics=Metrics()
+        )
         
         # Extract URLs
         urls = scraper.extract_urls()
@@ -86,98 +121,113 @@ def main():
         progress_bar = st.progress(0)
         status_text = st.empty()
         
-        # Create a text area for tqdm output
-        tqdm_output = st.empty()
+        # Recent log lines, re-rendered at a bounded rate
+        log_output = st.empty()
+        log_lines = deque(maxlen=LOG_LINES)
         
-        # Set up queue for capturing tqdm output
-        output_queue = queue.Queue()
-        original_stdout = sys.stdout
-        sys.stdout = StdoutCapture(output_queue)
+        # Scraper workers report typed events through a queue owned by this session
+        events = queue.Queue()
+        scraper.on_event = events.put
+        errors = []
+        
+        # Pages go into the archive as they finish, so it is ready when the last one completes
+        # Each run writes its own archive, so concurrent sessions never share a file
+        st.session_state.scrape_zip = run_archive_path("scraped_results.zip", st.session_state.get('scrape_zip'))
+        archive = IncrementalZip(st.session_state.scrape_zip)
         
         # Run scraping in a separate thread
         def run_scraping():
             try:
                 scraper.scrape_websites()
-                # Signal completion
-                output_queue.put("DONE")
             except Exception as e:
-                output_queue.put(f"ERROR: {str(e)}")
+                errors.append(e)
         
         thread = threading.Thread(target=run_scraping)
         thread.start()
         
         # Update the UI with progress
-        output_text = ""
         completed = False
-        total_urls = len(urls)
-        current_url = 0
+        last_render = 0.0
+        progress_event = None
+        throttled_event = None
         
         while not completed:
-            try:
-                # Get output from queue with timeout
-                line = output_queue.get(timeout=0.1)
-                
-                if line.lower() == "done":
-                    completed = True
-                    progress_bar.progress(100)
-                    status_text.success("Scraping completed successfully!")
-                elif line.lower().startswith("error"):
-                    status_text.error(line)
-                    completed = True
-                else:
-                    output_text += line
-                    tqdm_output.text_area("Scraping Progress", output_text, height=200, disabled=True)
-                    
-                    # Try to extract progress from tqdm output
-                    if "%" in line:
-                        try:
-                            percent = int(line.split("%")[0].split("|")[-1].strip())
-                            progress_bar.progress(percent/100)
-                            status_text.text(f"Scraping in progress: {percent}%")
-                        except:
-                            pass
-                    
-                    # Also check for "Scraping page: X" to update progress
-                    if "Scraping page:" in line:
-                        try:
-                            current_url = int(line.split("Scraping page:")[1].split(".")[0].strip())
-                            percent = min(100, int((current_url / total_urls) * 100))
-                            progress_bar.progress(percent/100)
-                            status_text.text(f"Scraping in progress: {percent}% (URL {current_url} of {total_urls})")
-                        except:
-                            pass
-                            
-                    # Check for sleep message
-                    if "Sleeping for" in line:
-                        status_text.info(f"Pausing for rate limit: {line}")
-            except queue.Empty:
-                time.sleep(0.1)
-                continue
-        
-        # Restore stdout
-        sys.stdout = original_stdout
-        
-        if completed and not output_text.startswith("ERROR"):
-            import zipfile
-                
-            with zipfile.ZipFile("scraped_results.zip", "w") as zipf:
-                # Add JSON files
-                for file in os.listdir("./json"):
-                    if file.endswith('.json'):
-                        zipf.write(os.path.join("./json", file))
-                
-                # Add MD files
-                for file in os.listdir("./md"):
-                    if file.endswith('.md'):
-                        zipf.write(os.path.join("./md", file))
+            # Drain everything queued since the last pass before touching the UI
+            drained = False
+            while True:
+                try:
+                    event = events.get(timeout=0.1 if not drained else 0)
+                except queue.Empty:
+                    break
+                drained = True
+                log_lines.append(describe(event))
+                if isinstance(event, PageDone) and (event.changed or not only_changed):
+                    add_page(archive, scraper.store, event.name)
+                if isinstance(event, (PageDone, PageFailed)):
+                    progress_event = event
+                elif isinstance(event, Throttled):
+                    throttled_event = event
+            
+            if not thread.is_alive() and events.empty():
+                completed = True
             
-            download("scraped_results.zip")
-            uploaded_file = None
-            proceed = None
-            completed = False
-            st.session_state.proceed_scraping = False
+            now = time.monotonic()
+            if drained and now - last_render >= RENDER_INTERVAL:
+                if throttled_event is not None:
+                    status_text.info(f"Pausing for rate limit: {describe(throttled_event)}")
+                    throttled_event = None
+                elif progress_event is not None and progress_event.total:
+                    percent = min(100, int(progress_event.completed / progress_event.total * 100))
+                    progress_bar.progress(percent / 100)
+                    status_text.text(f"Scraping in progress: {percent}% "
+                                     f"(URL {progress_event.completed} of {progress_event.total})")
+                log_output.text_area("Scraping Progress", "\n".join(log_lines), height=200, disabled=True)
+                last_render = now
+        
+        thread.join()
+        # Release the store's shard and index handles; the pages are still read from it below
+        scraper.store.close()
+        log_output.text_area("Scraping Progress", "\n".join(log_lines), height=200, disabled=True)
+        progress_bar.progress(100)
+        if errors:
+            status_text.error(f"ERROR: {errors[0]}")
+        elif scraper.failed:
+            status_text.warning(f"Scraping completed with {len(scraper.failed)} failed URLs.")
+        else:
+            status_text.success("Scraping completed successfully!")
+
+        st.write(f"{len(scraper.changed)} pages changed, {len(scraper.skipped)} URLs skipped as still fresh.")
+
+        with st.expander("Run metrics"):
+            st.json(scraper.metrics.report())
+
+        if scraper.failed:
+            with st.expander(f"Failed URLs ({len(scraper.failed)})"):
+                for url, error in scraper.failed:
+                    st.write(f"{url}: {error}")
+        
+        if completed and not errors:
+            # Pages skipped as still fresh are part of the full download too
+            if not only_changed:
+                for url in scraper.skipped:
+                    add_page(archive, scraper.store, url)
+
+            # List the changed pages so the embedding step can process only those
+            archive.writestr("changed_pages.txt", "\n".join(sorted(set(scraper.changed))))
+            zip_path = archive.close()
 
-                
+            with open(zip_path, "rb") as f:
+                st.download_button(
+                    label="Download scraped results ZIP",
+                    data=f,
+                    file_name="scraped_results.zip",
+                    mime="application/zip",
+                    on_click="ignore"
+                )
+            # st.download_button holds the whole archive in memory; large runs can copy it from disk instead
+            st.caption(f"The archive is also on the server at {os.path.abspath(zip_path)}")
+        else:
+            archive.close()
 
 if __name__ == "__main__":
     main()
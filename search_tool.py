@@ -0,0 +1,152 @@
+import os
+import time
+import streamlit as st
+from utils.embedder import Embedder
+from utils.search import VectorIndex, recall_at_k, quantization_report, source_dimensions, list_vector_files
+
+@st.cache_resource
+def load_directory(directory, dimension=None):
+    # Memory-mapped indexes are shared by every session of the app
+    return VectorIndex.from_directory(directory, dimension)
+
+footer = """
+<style>
+.footer {
+    position: fixed;
+    left: 0;
+    bottom: 0;
+    width: 100%;
+    background-color: #f1f1f1;
+    color: black;
+    text-align: center;
+    padding: 10px 0;
+    font-size: 15px;
+}
+.footer a {
+    color: navy;
+    text-decoration: none;
+}
+.footer a:hover {
+    text-decoration: underline;
+}
+</style>
+<div class="footer">
+    <p>Developed by <strong><a href="https://www.linkedin.com/in/tapaswi-v-s/" target="_blank">Tapaswi</a></strong></p>
+</div>
+"""
+
+def main():
+    st.set_page_config(page_title="Local Search", page_icon="🔎", layout="wide")
+    st.title("Local Vector Search")
+    st.markdown(footer, unsafe_allow_html=True)
+
+    # Step 1: Load embeddings
+    with st.container(border=True):
+        st.header("Step 1: Load Embeddings")
+
+        source = st.radio("Embeddings from", options=["Local directory", "Upload"], horizontal=True)
+        if source == "Local directory":
+            directory = st.text_input("Directory", value="./vectors")
+            uploaded_files = None
+        else:
+            directory = None
+            uploaded_files = st.file_uploader(
+                "Upload embedding files (JSON, or .npy with its .meta.jsonl)",
+                type=["json", "npy", "jsonl"],
+                accept_multiple_files=True
+            )
+
+        # Outputs of several sizes (<article>-<dimensions>) are searched one size at a time
+        try:
+            if directory:
+                sizes = sorted(set(source_dimensions(list_vector_files(directory)).values())) \
+                    if os.path.isdir(directory) else []
+            else:
+                sizes = sorted(set(source_dimensions(uploaded_files or []).values()))
+        except ValueError as e:
+            st.error(str(e))
+            st.stop()
+        dimension = st.selectbox("Dimensions", options=sizes) if len(sizes) > 1 else None
+
+        precision = st.selectbox(
+            "In-memory precision",
+            options=["float32", "float16", "int8"],
+            help="Quantized indexes rescore their best candidates against the full-precision vectors"
+        )
+        api_key = st.text_input("OpenAI API Key (to embed queries)", type="password")
+
+        if st.button("Load Index"):
+            try:
+                if directory:
+                    if not os.path.isdir(directory):
+                        st.error(f"Directory '{directory}' does not exist")
+                        st.stop()
+                    index = load_directory(directory, dimension)
+                elif uploaded_files:
+                    index = VectorIndex.from_files(uploaded_files, dimension)
+                else:
+                    st.error("Please upload embedding files")
+                    st.stop()
+                if precision != "float32":
+                    index = index.quantize(precision)
+            except ValueError as e:
+                st.error(str(e))
+                st.stop()
+            st.session_state.search_index = index
+            st.success(f"Loaded {len(index)} vectors with {index.dimension} dimensions "
+                       f"({index.nbytes / 2**20:.1f} MB as {index.values.dtype}).")
+
+        if 'search_index' in st.session_state and st.session_state.search_index.values.dtype == 'float32':
+            with st.expander("Quantization"):
+                st.write("Size and recall@10 of float16 and int8 copies against full-precision search.")
+                if st.button("Measure recall"):
+                    with st.spinner("Measuring..."):
+                        st.table(quantization_report(st.session_state.search_index))
+
+    # Step 2: Query
+    if 'search_index' in st.session_state:
+        index = st.session_state.search_index
+        with st.container(border=True):
+            st.header("Step 2: Query")
+
+            query = st.text_input("Query")
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                k = st.number_input("Results", min_value=1, max_value=100, value=5)
+            with col2:
+                use_ann = st.checkbox("Approximate search (IVF)", value=len(index) > 50_000)
+            with col3:
+                nprobe = st.number_input("Lists to probe", min_value=1, value=8, disabled=not use_ann)
+
+            if st.button("Search"):
+                if not query or not api_key:
+                    st.error("Please enter a query and your OpenAI API key")
+                    st.stop()
+
+                # Queries must be embedded with the same model and size as the corpus
+                embedder = Embedder(api_key, dimensions=index.dimension)
+                query_vector = embedder.embed_texts([query])[0]
+
+                if use_ann and index.ann is None:
+                    with st.spinner("Building IVF index..."):
+                        index.build_ann()
+
+                start = time.perf_counter()
+                matches = index.search(query_vector, k=int(k), nprobe=int(nprobe) if use_ann else None)[0]
+                elapsed_ms = (time.perf_counter() - start) * 1000
+
+                if use_ann:
+                    exact = index.search(query_vector, k=int(k))
+                    st.caption(f"Search took {elapsed_ms:.1f} ms, recall@{int(k)} vs exact: "
+                               f"{recall_at_k(exact, [matches]):.2f}")
+                else:
+                    st.caption(f"Search took {elapsed_ms:.1f} ms")
+
+                for match in matches:
+                    metadata = match['metadata']
+                    with st.expander(f"{match['score']:.3f} · {metadata.get('article', '')} › {metadata.get('header', '')}"):
+                        st.markdown(f"[{metadata.get('url', '')}]({metadata.get('url', '')})")
+                        st.write(metadata.get('doc', ''))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+import random
+import asyncio
+import openai
+from openai import AsyncOpenAI
+from utils.embedder import Embedder
+from utils.rate_limit import RateLimiter, retry_after_seconds
+
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APIConnectionError,
+    openai.APITimeoutError,
+    openai.InternalServerError,
+)
+
+class AsyncEmbedder(Embedder):
+    """
+    Embedder that keeps several embedding requests in flight at once.
+
+    Requests are admitted by a shared RPM/TPM token bucket; 429s and
+    transient errors are retried per batch with exponential backoff,
+    honoring the server's retry-after hints.
+    """
+
+    def __init__(self, api_key, model="text-embedding-3-large", dimensions=1024, cache=None,
+                 max_concurrency=8, requests_per_minute=3000, tokens_per_minute=1_000_000,
+                 max_retries=6, output_format="json", chunk_workers=None, base_url=None, metrics=None,
+                 vector_dtype="float32", dedup_threshold=None, chunk_tokens=None, chunk_overlap=0, journal=None,
+                 output_dimensions=None, encoding=None):
+        super().__init__(api_key, model=model, dimensions=dimensions, cache=cache,
+                         output_format=output_format, chunk_workers=chunk_workers, base_url=base_url,
+                         metrics=metrics, vector_dtype=vector_dtype,
+                         dedup_threshold=dedup_threshold, chunk_tokens=chunk_tokens,
+                         chunk_overlap=chunk_overlap, journal=journal, output_dimensions=output_dimensions,
+                         encoding=encoding)
+        # Retries are handled here so they go through the rate limiter
+        self.client = AsyncOpenAI(api_key=api_key, base_url=base_url, max_retries=0)
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.limiter = RateLimiter(requests_per_minute, tokens_per_minute, name='openai', metrics=self.metrics)
+
+    async def _create(self, inputs, n_tokens):
+        for attempt in range(self.max_retries + 1):
+            await self.limiter.acquire_async(n_tokens)
+            try:
+                with self.metrics.timer('api_latency_seconds', service='openai'):
+                    response = await self.client.embeddings.create(
+                        input=inputs,
+                        model=self.model,
+                        dimensions=self.dimensions
+                    )
+                self.limiter.record_success()
+                self.metrics.inc('tokens_embedded_total', n_tokens)
+                return response
+            except RETRYABLE_ERRORS as e:
+                self.metrics.inc('api_errors_total', service='openai')
+                if attempt == self.max_retries:
+                    raise
+                self.metrics.inc('api_retries_total', service='openai')
+                delay = retry_after_seconds(e)
+                if isinstance(e, openai.RateLimitError):
+                    self.limiter.throttle(delay)
+                if delay is None:
+                    delay = min(60, 2 ** attempt) + random.random()
+                self.metrics.inc('backoff_seconds_total', delay, service='openai')
+                await asyncio.sleep(delay)
+
+    async def aembed_texts(self, texts, on_progress=None):
+        """
+        Embeds texts concurrently, returning vectors in input order.
+
+        Params:
+        ------
+        texts (list[str]): Strings to embed.
+        on_progress (callable): Called with (completed_batches, total_batches) after each batch.
+        """
+        embeddings, pending, keys = self._lookup_cache(texts)
+        batches = self.make_batches([texts[i] for i in pending])
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        completed = 0
+
+        async def run(batch, n_tokens):
+            nonlocal completed
+            async with semaphore:
+                response = await self._create([text for _, text in batch], n_tokens)
+            self._collect_batch(response, batch, pending, embeddings, keys)
+            completed += 1
+            if on_progress:
+                on_progress(completed, len(batches))
+
+        # A failed batch must not cancel the others; finished batches still reach the journal and cache
+        results = await asyncio.gather(*(run(b, n) for b, n in batches), return_exceptions=True)
+        errors = [r for r in results if isinstance(r, BaseException)]
+        if errors:
+            raise RuntimeError(f"{len(errors)} of {len(batches)} embedding batches failed: {errors[0]}") from errors[0]
+        return embeddings
+
+    async def aprocess_md_files(self, uploaded_files, on_progress=None, on_written=None):
+        files, doc_strings = self.split_files(uploaded_files)
+        embeddings = await self.aembed_texts(doc_strings, on_progress=on_progress)
+        return self.finish(files, embeddings, on_written=on_written)
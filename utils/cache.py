@@ -0,0 +1,100 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from array import array
+
+class EmbeddingCache:
+    """
+    On-disk embedding cache keyed by a hash of (model, dimensions, text).
+
+    Vectors are stored as float32 blobs in SQLite. Once the stored vectors
+    exceed `max_bytes`, the least recently used entries are evicted.
+    """
+
+    def __init__(self, path='./cache/embeddings.sqlite', max_bytes=1 << 30):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._lock = threading.Lock()
+        # Streamlit reruns the script on different threads, so the connection is shared behind a lock
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS embeddings ('
+                'key TEXT PRIMARY KEY, vector BLOB NOT NULL, '
+                'size INTEGER NOT NULL, last_access REAL NOT NULL)'
+            )
+            self._conn.execute('CREATE INDEX IF NOT EXISTS idx_last_access ON embeddings(last_access)')
+
+    @staticmethod
+    def make_key(model, dimensions, text):
+        return hashlib.sha256(f'{model}\x00{dimensions}\x00{text}'.encode('utf-8')).hexdigest()
+
+    def get_many(self, keys):
+        """Returns a dict of key -> embedding for the keys present in the cache."""
+        found = {}
+        now = time.time()
+        with self._lock, self._conn:
+            # SQLite caps the number of bound parameters, so look keys up in slices
+            for i in range(0, len(keys), 500):
+                part = keys[i:i+500]
+                rows = self._conn.execute(
+                    f'SELECT key, vector FROM embeddings WHERE key IN ({",".join("?" * len(part))})',
+                    part
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = array('f', blob).tolist()
+                self._conn.executemany(
+                    'UPDATE embeddings SET last_access = ? WHERE key = ?',
+                    [(now, key) for key, _ in rows]
+                )
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, items):
+        """Stores (key, embedding) pairs and evicts old entries past the size cap."""
+        now = time.time()
+        rows = []
+        for key, embedding in items:
+            blob = array('f', embedding).tobytes()
+            rows.append((key, blob, len(blob), now))
+        with self._lock, self._conn:
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO embeddings (key, vector, size, last_access) VALUES (?, ?, ?, ?)',
+                rows
+            )
+            self._evict()
+
+    def _evict(self):
+        total = self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM embeddings').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess = total - self.max_bytes
+        stale, freed = [], 0
+        for key, size in self._conn.execute('SELECT key, size FROM embeddings ORDER BY last_access'):
+            stale.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        self._conn.executemany('DELETE FROM embeddings WHERE key = ?', stale)
+
+    def stats(self):
+        with self._lock:
+            count, total = self._conn.execute(
+                'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM embeddings'
+            ).fetchone()
+        return {'entries': count, 'bytes': total, 'hits': self.hits, 'misses': self.misses}
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM embeddings')
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,174 @@
+import os
+import re
+import tiktoken
+from concurrent.futures import ProcessPoolExecutor
+from langchain_text_splitters import MarkdownHeaderTextSplitter
+from utils.ids import chunk_id
+
+HEADERS_TO_SPLIT_ON = [
+    ("#", "page_title"),
+    ("##", "header"),
+    ("###", "header"),
+    ("####", "header"),
+]
+
+# Markdown markup stripped from titles, headers and chunk text
+CLEAN_PATTERN = re.compile(r'[#*_\-]')
+
+# Below this many files the pool's start-up cost outweighs the parallelism
+MIN_FILES_FOR_POOL = 8
+
+# Tokenizer of the text-embedding-3 models
+ENCODING_NAME = 'cl100k_base'
+
+_splitters = {}
+_encodings = {}
+
+def _get_splitter(headers_to_split_on):
+    # One splitter per process and header configuration, reused across files
+    key = tuple(headers_to_split_on)
+    if key not in _splitters:
+        _splitters[key] = MarkdownHeaderTextSplitter(list(headers_to_split_on))
+    return _splitters[key]
+
+def _get_encoding(encoding):
+    # Either a tiktoken encoding name or an encoding object passed in whole (see Embedder's `encoding`)
+    if not isinstance(encoding, str):
+        return encoding
+    if encoding not in _encodings:
+        _encodings[encoding] = tiktoken.get_encoding(encoding)
+    return _encodings[encoding]
+
+def _windows(tokens, chunk_tokens, overlap_tokens):
+    """Evenly sized token windows of at most `chunk_tokens`, each overlapping the previous one."""
+    span = len(tokens) - overlap_tokens
+    parts = -(-span // (chunk_tokens - overlap_tokens))
+    bounds = [i * span // parts for i in range(parts + 1)]
+    return [tokens[bounds[i]:bounds[i + 1] + overlap_tokens] for i in range(parts)]
+
+def size_sections(sections, encoding, chunk_tokens, overlap_tokens=0):
+    """
+    Resizes header sections towards `chunk_tokens` tokens each.
+
+    Consecutive sections of the same article that fit together are merged,
+    listing their headers as "first / second"; sections above the budget are
+    split into evenly sized windows overlapping by `overlap_tokens`.
+
+    Params:
+    ------
+    sections (list[tuple[str, str, str]]): (page title, header, text) in document order.
+    encoding: tiktoken encoding used to count tokens.
+
+    Returns:
+    -------
+    (list[tuple[str, str, str]]): The resized sections, same shape.
+    """
+    sized = []
+    pending = None  # [page_title, headers, texts, tokens] being merged
+    for page_title, header, text in sections:
+        tokens = encoding.encode(text)
+        if pending and pending[0] == page_title and pending[3] + len(tokens) <= chunk_tokens:
+            if header and header not in pending[1]:
+                pending[1].append(header)
+            pending[2].append(text)
+            pending[3] += len(tokens)
+            continue
+
+        if pending:
+            sized.append((pending[0], ' / '.join(pending[1]), ' '.join(pending[2])))
+            pending = None
+        if len(tokens) > chunk_tokens:
+            for window in _windows(tokens, chunk_tokens, overlap_tokens):
+                sized.append((page_title, header, encoding.decode(window).strip()))
+        else:
+            pending = [page_title, [header] if header else [], [text], len(tokens)]
+    if pending:
+        sized.append((pending[0], ' / '.join(pending[1]), ' '.join(pending[2])))
+    return sized
+
+def chunk_markdown(file_name, md_file_text, headers_to_split_on=HEADERS_TO_SPLIT_ON, chunk_tokens=None,
+                   overlap_tokens=0, encoding_name=ENCODING_NAME):
+    """
+    Splits one scraped markdown file (URL on the first line) into cleaned chunk records.
+
+    With `chunk_tokens`, header sections are then merged or split towards that
+    many tokens (see `size_sections`).
+
+    Returns:
+    -------
+    (tuple[str, list[dict], list[str]]): The file name, its vector records
+        (without values) and the doc strings to embed, in the same order.
+    """
+    md_content = md_file_text.split('\n')
+    url = md_content[0].strip()
+    md_text = '\n'.join(md_content[1:])
+
+    docs = _get_splitter(headers_to_split_on).split_text(md_text)
+
+    sections = []
+    for doc in docs:
+        # Clean metadata and content
+        page_title = CLEAN_PATTERN.sub('', doc.metadata.get('page_title', '')).strip()
+        header = CLEAN_PATTERN.sub('', doc.metadata.get('header', '')).strip()
+        text = CLEAN_PATTERN.sub('', doc.page_content).replace('\n', ' ').strip()
+        sections.append((page_title, header, text))
+
+    if chunk_tokens:
+        sections = size_sections(sections, _get_encoding(encoding_name), chunk_tokens, overlap_tokens)
+
+    vectors = []
+    doc_strings = []
+    ordinals = {}
+    for page_title, header, text in sections:
+        doc_string = f'{page_title} | {header} | {text}'
+        doc_strings.append(doc_string)
+
+        # Chunks sharing a header path are told apart by their order under it
+        header_path = f'{page_title}/{header}'
+        ordinal = ordinals.get(header_path, 0)
+        ordinals[header_path] = ordinal + 1
+
+        # Prepare vector data
+        vectors.append({
+            'id': chunk_id(url, header_path, ordinal),
+            'metadata': {
+                'article': page_title,
+                'header': header,
+                'url': url,
+                'doc': doc_string
+            },
+            'values': None
+        })
+    return file_name, vectors, doc_strings
+
+def _chunk_markdown_args(args):
+    return chunk_markdown(*args)
+
+def chunk_files(files, headers_to_split_on=HEADERS_TO_SPLIT_ON, max_workers=None, chunk_tokens=None,
+                overlap_tokens=0, encoding_name=ENCODING_NAME, encoding=None):
+    """
+    Chunks many markdown files across a process pool.
+
+    Params:
+    ------
+    files (list[tuple[str, str]]): (file name, file text) pairs.
+    max_workers (int): Pool size, defaults to the number of CPUs.
+    chunk_tokens (int): Token budget per chunk, None to keep the header sections as they are.
+    overlap_tokens (int): Tokens repeated between the parts of a split section.
+    encoding (tiktoken.Encoding): Counts tokens instead of `encoding_name`; it is pickled to the workers.
+
+    Returns:
+    -------
+    (list[tuple[str, list[dict], list[str]]]): chunk_markdown results in input order.
+    """
+    tasks = [
+        (name, text, headers_to_split_on, chunk_tokens, overlap_tokens, encoding or encoding_name)
+        for name, text in files
+    ]
+    max_workers = max_workers or os.cpu_count() or 1
+    if max_workers == 1 or len(tasks) < MIN_FILES_FOR_POOL:
+        return [chunk_markdown(*task) for task in tasks]
+
+    chunksize = max(1, len(tasks) // (max_workers * 4))
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(_chunk_markdown_args, tasks, chunksize=chunksize))
@@ -0,0 +1,67 @@
+import time
+import threading
+import pinecone
+from openai import OpenAI
+from firecrawl import FirecrawlApp
+
+# How long index listings and stats are reused before asking Pinecone again
+INDEX_LIST_TTL = 60
+INDEX_STATS_TTL = 30
+
+class TTLCache:
+    """Thread-safe map whose entries expire `ttl` seconds after they were loaded."""
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, load, ttl):
+        """Returns the cached value for `key`, calling `load()` if it is missing or expired."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                return entry[1]
+        # Load outside the lock so one slow call does not block unrelated keys
+        value = load()
+        with self._lock:
+            self._entries[key] = (now + ttl, value)
+        return value
+
+    def invalidate(self, *prefix):
+        """Drops every entry whose key starts with `prefix`."""
+        with self._lock:
+            for key in [key for key in self._entries if key[:len(prefix)] == prefix]:
+                del self._entries[key]
+
+
+# Clients are shared by every caller in the process (every Streamlit session and rerun),
+# so their HTTP connection pools stay warm between interactions
+_clients = {}
+_clients_lock = threading.Lock()
+
+def _client(kind, key, create):
+    with _clients_lock:
+        if (kind, key) not in _clients:
+            _clients[(kind, key)] = create()
+        return _clients[(kind, key)]
+
+def get_openai(api_key, base_url=None):
+    return _client('openai', (api_key, base_url), lambda: OpenAI(api_key=api_key, base_url=base_url))
+
+def get_firecrawl(api_key, api_url=None):
+    if api_url:
+        return _client('firecrawl', (api_key, api_url), lambda: FirecrawlApp(api_key=api_key, api_url=api_url))
+    return _client('firecrawl', (api_key, None), lambda: FirecrawlApp(api_key=api_key))
+
+def get_pinecone(api_key):
+    return _client('pinecone', api_key, lambda: pinecone.Pinecone(api_key=api_key))
+
+def get_index(api_key, index_name):
+    # Fetched before taking the pool's lock, which is not reentrant
+    pc = get_pinecone(api_key)
+    return _client('index', (api_key, index_name), lambda: pc.Index(index_name))
+
+
+# Index listings and stats, keyed by ('indexes', api_key) and ('stats', api_key, index_name)
+METADATA_CACHE = TTLCache()
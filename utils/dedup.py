@@ -0,0 +1,148 @@
+import re
+import zlib
+import hashlib
+import numpy as np
+
+# 128 MinHash permutations in 16 LSH bands of 8 rows: pairs above ~0.7 Jaccard
+# almost always share a band, and candidates are then checked against `threshold`
+NUM_PERM = 128
+BANDS = 16
+SHINGLE_WORDS = 3
+DEFAULT_THRESHOLD = 0.85
+# Serialized size allowed for a kept chunk's `metadata['urls']`, well inside Pinecone's
+# 40 KB metadata limit alongside the chunk text (about 250 URLs of 65 bytes)
+MAX_URLS_BYTES = 16 * 1024
+
+_MERSENNE = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_rng = np.random.default_rng(1)
+_A = _rng.integers(1, (1 << 61) - 1, NUM_PERM, dtype=np.uint64)
+_B = _rng.integers(0, (1 << 61) - 1, NUM_PERM, dtype=np.uint64)
+
+_WORD = re.compile(r'\w+')
+
+def normalize(text):
+    return ' '.join(_WORD.findall(text.lower()))
+
+def minhash(text):
+    """MinHash signature of the word shingles of an already normalized text."""
+    words = text.split()
+    shingles = {' '.join(words[i:i + SHINGLE_WORDS]) for i in range(max(1, len(words) - SHINGLE_WORDS + 1))}
+    hashes = np.fromiter((zlib.crc32(s.encode('utf-8')) for s in shingles), dtype=np.uint64, count=len(shingles))
+    # Universal hashing (a*x + b) mod p, one row per permutation; uint64 overflow wraps by design
+    permuted = np.bitwise_and((np.outer(_A, hashes) + _B[:, None]) % _MERSENNE, _MAX_HASH)
+    return permuted.min(axis=1)
+
+
+class _DisjointSet:
+    def __init__(self, n):
+        self.parent = list(range(n))
+
+    def find(self, i):
+        while self.parent[i] != i:
+            self.parent[i] = self.parent[self.parent[i]]
+            i = self.parent[i]
+        return i
+
+    def union(self, i, j):
+        i, j = self.find(i), self.find(j)
+        # The earliest chunk stays the representative
+        if i != j:
+            self.parent[max(i, j)] = min(i, j)
+
+
+def duplicate_groups(texts, threshold=DEFAULT_THRESHOLD):
+    """
+    Groups exact and near-duplicate texts.
+
+    Exact duplicates (after lower-casing and dropping punctuation) are matched
+    by hash; near duplicates by MinHash LSH, keeping pairs whose estimated
+    Jaccard similarity of word 3-grams reaches `threshold`.
+
+    Returns:
+    -------
+    (list[int]): For each text, the position of the first text of its group.
+    """
+    normalized = [normalize(text) for text in texts]
+    groups = _DisjointSet(len(texts))
+
+    first_seen = {}
+    distinct = []
+    for i, text in enumerate(normalized):
+        digest = hashlib.sha1(text.encode('utf-8')).digest()
+        if digest in first_seen:
+            groups.union(first_seen[digest], i)
+        else:
+            first_seen[digest] = i
+            distinct.append(i)
+
+    signatures = {i: minhash(normalized[i]) for i in distinct}
+    rows = NUM_PERM // BANDS
+    for band in range(BANDS):
+        buckets = {}
+        for i in distinct:
+            buckets.setdefault(signatures[i][band * rows:(band + 1) * rows].tobytes(), []).append(i)
+        for members in buckets.values():
+            # Every pair, not just the first member: two near duplicates can
+            # share a bucket with a text that matches neither of them
+            for k, i in enumerate(members):
+                for j in members[k + 1:]:
+                    if groups.find(i) == groups.find(j):
+                        continue
+                    if np.mean(signatures[i] == signatures[j]) >= threshold:
+                        groups.union(i, j)
+
+    return [groups.find(i) for i in range(len(texts))]
+
+def dedup_chunks(files, doc_strings, threshold=DEFAULT_THRESHOLD):
+    """
+    Drops chunks that duplicate an earlier chunk of the same job.
+
+    Chunks are compared on their header and text, not the article title.
+    Each kept chunk lists the URLs of the articles it appeared in under
+    `metadata['urls']`, first seen first, up to MAX_URLS_BYTES of them so
+    the vector stays upsertable. `metadata['url_count']` is the full count,
+    which is larger when the list was cut.
+
+    Params:
+    ------
+    files (list): (file_name, vectors) pairs from `Embedder.split_texts`.
+    doc_strings (list[str]): The matching doc strings, in the same order.
+    threshold (float): Minimum estimated Jaccard similarity for near duplicates.
+
+    Returns:
+    -------
+    (tuple[list, list[str], int]): The files and doc strings with duplicates
+        removed, and the number of chunks dropped.
+    """
+    vectors = [vector for _, file_vectors in files for vector in file_vectors]
+    representatives = duplicate_groups([doc.split(' | ', 1)[-1] for doc in doc_strings], threshold)
+
+    # representative -> [listed URLs, every URL seen, serialized size of the list]
+    urls = {}
+    for vector, representative in zip(vectors, representatives):
+        group = urls.setdefault(representative, [[], set(), 2])
+        url = vector['metadata']['url']
+        if url in group[1]:
+            continue
+        group[1].add(url)
+        # Quotes, comma and space around each URL in the JSON list
+        size = len(url.encode('utf-8')) + 4
+        if group[2] + size <= MAX_URLS_BYTES:
+            group[0].append(url)
+            group[2] += size
+
+    kept_files, kept_doc_strings = [], []
+    position = 0
+    for file_name, file_vectors in files:
+        kept = []
+        for vector in file_vectors:
+            representative = representatives[position]
+            if representative == position:
+                vector['metadata']['urls'] = urls[representative][0]
+                vector['metadata']['url_count'] = len(urls[representative][1])
+                kept.append(vector)
+                kept_doc_strings.append(doc_strings[position])
+            position += 1
+        kept_files.append((file_name, kept))
+    return kept_files, kept_doc_strings, len(doc_strings) - len(kept_doc_strings)
@@ -1,68 +1,231 @@
 import os
-import re
 import json
-import uuid
+import tiktoken
 from tqdm import tqdm
 from dotenv import load_dotenv
-from langchain_text_splitters import MarkdownHeaderTextSplitter
-from openai import OpenAI
+from utils.chunker import HEADERS_TO_SPLIT_ON, chunk_files
+from utils.dedup import dedup_chunks
+from utils.vector_store import write_vectors, truncate_embeddings
+from utils.cache import EmbeddingCache
+from utils.metrics import METRICS
+from utils.clients import get_openai
+
+# Per-request limits of the embeddings endpoint for text-embedding-3-large
+MAX_BATCH_INPUTS = 2048
+MAX_BATCH_TOKENS = 300_000
+MAX_INPUT_TOKENS = 8191
 
 class Embedder:
-    def __init__(self, api_key):
-        self.client = OpenAI(api_key=api_key)
-        self.headers_to_split_on = [
-            ("#", "page_title"),
-            ("##", "header"),
-            ("###", "header"),
-            ("####", "header"),
-        ]
-
-    def process_md_files(self, uploaded_files):
-        json_dir = './json'
-        os.makedirs(json_dir, exist_ok=True)
+    def __init__(self, api_key, model="text-embedding-3-large", dimensions=1024, cache=None,
+                 output_format="json", chunk_workers=None, base_url=None, metrics=None, vector_dtype="float32",
+                 dedup_threshold=None, chunk_tokens=None, chunk_overlap=0, journal=None, output_dimensions=None,
+                 encoding=None):
+        # base_url points the client at an OpenAI-compatible server, e.g. the benchmark stand-in.
+        # Clients are pooled per key, so the tools reuse warm connections across reruns
+        self.client = get_openai(api_key, base_url)
+        self.model = model
+        # With several output sizes, the largest is requested once and the others derived from it
+        self.output_dimensions = sorted(set(output_dimensions)) if output_dimensions else None
+        self.dimensions = self.output_dimensions[-1] if self.output_dimensions else dimensions
+        self.cache = cache
+        # Checkpoint of this job's finished batches, so a restarted job resumes (see utils.journal)
+        self.journal = journal
+        self.metrics = metrics or METRICS
+        # "json" writes one list of vector dicts per file, "npy" a float32 matrix plus metadata table
+        self.output_format = output_format
+        # Precision of the "npy" matrix: float32, float16 or per-row scaled int8
+        self.vector_dtype = vector_dtype
+        # Token counter; pass one in to run without downloading the model's tiktoken encoding
+        self.encoding = encoding or tiktoken.encoding_for_model(model)
+        self.headers_to_split_on = HEADERS_TO_SPLIT_ON
+        # Processes used for splitting and cleaning, defaults to the number of CPUs
+        self.chunk_workers = chunk_workers
+        # When set, header sections are merged or split towards this many tokens
+        if chunk_tokens and not 0 <= chunk_overlap < chunk_tokens:
+            raise ValueError("chunk_overlap must be smaller than chunk_tokens")
+        self.chunk_tokens = min(chunk_tokens, MAX_INPUT_TOKENS) if chunk_tokens else None
+        self.chunk_overlap = chunk_overlap
+        # When set, near-duplicate chunks of a job are embedded once (see utils.dedup)
+        self.dedup_threshold = dedup_threshold
+
+    def _prepare_input(self, text):
+        """Returns the text truncated to the per-input token limit and its token count."""
+        tokens = self.encoding.encode(text)
+        if len(tokens) > MAX_INPUT_TOKENS:
+            tokens = tokens[:MAX_INPUT_TOKENS]
+            text = self.encoding.decode(tokens)
+        return text, len(tokens)
+
+    def make_batches(self, texts):
+        """
+        Packs texts into batches that respect the input-count and token limits.
+
+        Params:
+        ------
+        texts (list[str]): Strings to embed.
+
+        Returns:
+        -------
+        (list[tuple[list[tuple[int, str]], int]]): Batches of (position, text) pairs with their token count.
+        """
+        batches = []
+        batch, batch_tokens = [], 0
+        for i, text in enumerate(texts):
+            text, n_tokens = self._prepare_input(text)
+            if batch and (len(batch) >= MAX_BATCH_INPUTS or batch_tokens + n_tokens > MAX_BATCH_TOKENS):
+                batches.append((batch, batch_tokens))
+                batch, batch_tokens = [], 0
+            batch.append((i, text))
+            batch_tokens += n_tokens
+        if batch:
+            batches.append((batch, batch_tokens))
+        return batches
+
+    def _lookup_cache(self, texts):
+        """Returns (embeddings, pending, keys) with journaled and cached vectors filled in and the positions still to embed."""
+        embeddings = [None] * len(texts)
+        if self.cache is None and self.journal is None:
+            return embeddings, list(range(len(texts))), None
+
+        keys = [EmbeddingCache.make_key(self.model, self.dimensions, text) for text in texts]
+        pending = list(range(len(texts)))
+        # The journal holds this job's batches from an interrupted run, the cache those of earlier jobs
+        for store, metric in ((self.journal, 'embedding_journal_hits_total'), (self.cache, 'embedding_cache_hits_total')):
+            if store is None or not pending:
+                continue
+            found = store.get_many(list({keys[i] for i in pending}))
+            if store is self.cache:
+                self.metrics.inc('embedding_cache_lookups_total', len(pending))
+            still_pending = []
+            for i in pending:
+                if keys[i] in found:
+                    embeddings[i] = found[keys[i]]
+                    self.metrics.inc(metric)
+                else:
+                    still_pending.append(i)
+            pending = still_pending
+        return embeddings, pending, keys
+
+    def _collect_batch(self, response, batch, pending, embeddings, keys):
+        # The API tags each result with the position of its input in the request
+        for item in response.data:
+            embeddings[pending[batch[item.index][0]]] = item.embedding
+        if keys is not None:
+            items = [(keys[pending[pos]], embeddings[pending[pos]]) for pos, _ in batch]
+            if self.journal is not None:
+                self.journal.put_many(items)
+            if self.cache is not None:
+                self.cache.put_many(items)
+
+    def embed_texts(self, texts):
+        """Embeds texts in as few requests as possible, returning vectors in input order."""
+        # Serve unchanged texts from the cache and only send the misses to the API
+        embeddings, pending, keys = self._lookup_cache(texts)
+
+        batches = self.make_batches([texts[i] for i in pending])
+        for batch, n_tokens in tqdm(batches, desc="Embedding batches"):
+            with self.metrics.timer('api_latency_seconds', service='openai'):
+                response = self.client.embeddings.create(
+                    input=[text for _, text in batch],
+                    model=self.model,
+                    dimensions=self.dimensions
+                )
+            self.metrics.inc('tokens_embedded_total', n_tokens)
+            self._collect_batch(response, batch, pending, embeddings, keys)
+        return embeddings
+
+    def split_files(self, uploaded_files):
+        """
+        Splits uploaded markdown files into chunk records awaiting embeddings.
+
+        All files are chunked across a process pool before any embedding starts.
+
+        Returns:
+        -------
+        (tuple[list, list[str]]): (file_name, vectors) pairs and the doc strings to embed, in order.
+        """
+        return self.split_texts([(f.name, f.getvalue().decode("utf-8")) for f in uploaded_files])
+
+    def split_texts(self, texts):
+        """Same as `split_files` for (file name, markdown text) pairs."""
+        files = []
+        doc_strings = []
+        with self.metrics.timer('stage_seconds', stage='chunk'):
+            chunked = chunk_files(
+                texts, self.headers_to_split_on, max_workers=self.chunk_workers, chunk_tokens=self.chunk_tokens,
+                overlap_tokens=self.chunk_overlap, encoding=self.encoding
+            )
+        for file_name, vectors, file_doc_strings in chunked:
+            files.append((file_name, vectors))
+            doc_strings += file_doc_strings
+        self.metrics.inc('chunks_total', len(doc_strings))
+
+        if self.dedup_threshold:
+            with self.metrics.timer('stage_seconds', stage='dedup'):
+                files, doc_strings, dropped = dedup_chunks(files, doc_strings, self.dedup_threshold)
+            self.metrics.inc('duplicate_chunks_total', dropped)
+        return files, doc_strings
+
+    def _write_output(self, out_dir, stem, vectors):
+        if self.output_format == 'npy':
+            return write_vectors(os.path.join(out_dir, stem), vectors, self.vector_dtype)
+        # Save to JSON
+        json_path = os.path.join(out_dir, stem + '.json')
+        with open(json_path, 'w') as f:
+            json.dump(vectors, f)
+        return [json_path]
+
+    def write_files(self, files, embeddings, on_written=None):
+        """
+        Attaches embeddings to their chunks and writes the output files for each source file.
+
+        With `output_dimensions`, one output per size is written as `<name>-<dimensions>`,
+        and the chunks keep the full-size vectors.
+        `on_written` is called with each output path as soon as it is on disk.
+        """
+        out_dir = './json' if self.output_format == 'json' else './vectors'
+        os.makedirs(out_dir, exist_ok=True)
         all_files = []
 
-        for uploaded_file in tqdm(uploaded_files, desc="Processing files"):
-            file_name = uploaded_file.name
-            md_content = uploaded_file.getvalue().decode("utf-8").split('\n')
-            url = md_content[0].strip()
-            md_text = '\n'.join(md_content[1:])
-
-            splitter = MarkdownHeaderTextSplitter(self.headers_to_split_on)
-            docs = splitter.split_text(md_text)
-            
-            vectors = []
-            for doc in docs:
-                # Clean metadata and content
-                page_title = re.sub(r'[#*_\-]', '', doc.metadata.get('page_title', '')).strip()
-                header = re.sub(r'[#*_\-]', '', doc.metadata.get('header', '')).strip()
-                text = re.sub(r'[#*_\-]', '', doc.page_content).replace('\n', ' ').strip()
-                
-                # Generate embedding
-                doc_string = f'{page_title} | {header} | {text}'
-                embedding = self.client.embeddings.create(
-                    input=doc_string,
-                    model="text-embedding-3-large",
-                    dimensions=1024
-                ).data[0].embedding
-                
-                # Prepare vector data
-                vector = {
-                    'id': str(uuid.uuid4()),
-                    'metadata': {
-                        'article': page_title,
-                        'header': header,
-                        'url': url,
-                        'doc': doc_string
-                    },
-                    'values': embedding
-                }
-                vectors.append(vector)
-            
-            # Save to JSON
-            json_path = os.path.join(json_dir, file_name.replace('.md', '.json'))
-            with open(json_path, 'w') as f:
-                json.dump(vectors, f)
-            all_files.append(json_path)
-        
-        return all_files
\ No newline at end of file
+        embeddings = list(embeddings)
+        variants = truncate_embeddings(embeddings, self.output_dimensions) if self.output_dimensions else None
+        row = 0
+        for file_name, vectors in files:
+            # Every chunk of this file duplicated one kept elsewhere
+            if not vectors:
+                continue
+            for vector in vectors:
+                vector['values'] = embeddings[row]
+                row += 1
+
+            stem = file_name.replace('.md', '')
+            with self.metrics.timer('file_seconds', stage='embed_write'):
+                if variants is None:
+                    written = self._write_output(out_dir, stem, vectors)
+                else:
+                    written = []
+                    rows = slice(row - len(vectors), row)
+                    for d, values in variants.items():
+                        sized = [{**vector, 'values': v} for vector, v in zip(vectors, values[rows].tolist())]
+                        written += self._write_output(out_dir, f'{stem}-{d}', sized)
+            self.metrics.inc('bytes_written_total', sum(os.path.getsize(path) for path in written), stage='embed')
+            all_files += written
+            if on_written:
+                for path in written:
+                    on_written(path)
+
+        return all_files
+
+    def process_md_files(self, uploaded_files, on_written=None):
+        # Split every file first so chunks from all files share the same requests
+        files, doc_strings = self.split_files(uploaded_files)
+        embeddings = self.embed_texts(doc_strings)
+        return self.finish(files, embeddings, on_written=on_written)
+
+    def finish(self, files, embeddings, on_written=None):
+        """Writes the output files, then drops the job's journal since nothing is left to resume."""
+        written = self.write_files(files, embeddings, on_written=on_written)
+        if self.journal is not None:
+            self.journal.discard()
+            self.journal = None
+        return written
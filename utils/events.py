@@ -0,0 +1,52 @@
+from dataclasses import dataclass
+
+# Progress events emitted by Scrape.scrape_websites through its `on_event` callback.
+# Callbacks run on scraper worker threads, so UIs should hand them to a queue.
+
+@dataclass(frozen=True)
+class ScrapeStarted:
+    total: int
+    skipped: int
+
+@dataclass(frozen=True)
+class PageDone:
+    url: str
+    title: str
+    name: str
+    changed: bool
+    completed: int
+    total: int
+
+@dataclass(frozen=True)
+class Throttled:
+    url: str
+    delay: float
+    reason: str
+
+@dataclass(frozen=True)
+class PageFailed:
+    url: str
+    error: str
+    completed: int
+    total: int
+
+@dataclass(frozen=True)
+class ScrapeFinished:
+    completed: int
+    failed: int
+    changed: int
+
+
+def describe(event):
+    """One-line human-readable description of an event, for logs and the CLI."""
+    if isinstance(event, ScrapeStarted):
+        return f"Scraping {event.total} URLs ({event.skipped} skipped as still fresh)"
+    if isinstance(event, PageDone):
+        return f"Scraping page: {event.completed}. {event.title}"
+    if isinstance(event, Throttled):
+        return f"Waiting {event.delay:.1f}s before {event.url} ({event.reason})"
+    if isinstance(event, PageFailed):
+        return f"Failed to scrape {event.url}: {event.error}"
+    if isinstance(event, ScrapeFinished):
+        return f"Finished: {event.completed} scraped, {event.changed} changed, {event.failed} failed"
+    return str(event)
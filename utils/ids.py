@@ -0,0 +1,17 @@
+import hashlib
+
+def url_prefix(url):
+    """ID prefix shared by every chunk of the article at `url`."""
+    return hashlib.sha1(url.encode('utf-8')).hexdigest()[:16]
+
+def chunk_id(url, header_path, ordinal):
+    """
+    Stable vector ID for a chunk, derived from its article URL, header path and
+    position among chunks with the same header path.
+
+    Re-ingesting an unchanged article reproduces the same IDs, so upserts
+    overwrite instead of duplicating, and `url_prefix(url)` lists every
+    vector of an article.
+    """
+    digest = hashlib.sha1(f'{header_path}\x00{ordinal}'.encode('utf-8')).hexdigest()[:16]
+    return f'{url_prefix(url)}#{digest}'
@@ -0,0 +1,154 @@
+import os
+import time
+import socket
+import sqlite3
+import threading
+
+PENDING = 'pending'
+LEASED = 'leased'
+DONE = 'done'
+FAILED = 'failed'
+
+def default_worker_id():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+class JobQueue:
+    """
+    Durable queue of URLs to scrape, stored in SQLite.
+
+    Each URL has a state (pending, leased, done or failed), an attempt count
+    and, while leased, an owner and an expiry time. Workers in any number of
+    processes sharing the file claim URLs inside a write transaction, so a URL
+    is only leased to one of them at a time. Leases that expire because their
+    worker crashed are put back as pending (or failed once out of attempts)
+    by the next claim.
+
+    The file must live on a filesystem with working locks: a local disk, or
+    a network mount that supports them.
+    """
+
+    def __init__(self, path='./cache/jobs.sqlite', lease_seconds=600, max_attempts=3):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._lock = threading.Lock()
+        # Autocommit mode, so transactions are opened explicitly with BEGIN IMMEDIATE
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        with self._lock:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS jobs ('
+                'url TEXT PRIMARY KEY, state TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, '
+                'lease_owner TEXT, lease_expires REAL, last_error TEXT, md_path TEXT, updated REAL NOT NULL)'
+            )
+            self._conn.execute('CREATE INDEX IF NOT EXISTS idx_state ON jobs(state, attempts)')
+
+    def _transaction(self, func):
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                result = func(self._conn)
+            except BaseException:
+                self._conn.execute('ROLLBACK')
+                raise
+            self._conn.execute('COMMIT')
+            return result
+
+    def add(self, urls):
+        """Queues URLs that are not in the queue yet. Returns how many were added."""
+        now = time.time()
+
+        def insert(conn):
+            before = conn.total_changes
+            conn.executemany(
+                'INSERT OR IGNORE INTO jobs (url, state, updated) VALUES (?, ?, ?)',
+                [(url, PENDING, now) for url in urls]
+            )
+            return conn.total_changes - before
+        return self._transaction(insert)
+
+    def claim(self, worker_id, limit=1):
+        """
+        Leases up to `limit` pending URLs to `worker_id`, least-attempted first.
+
+        Returns:
+        -------
+        (list[str]): The claimed URLs; empty when nothing is left to claim.
+        """
+        def lease(conn):
+            now = time.time()
+            # Re-queue the leases of crashed workers first
+            conn.execute(
+                'UPDATE jobs SET state = CASE WHEN attempts >= ? THEN ? ELSE ? END, '
+                "lease_owner = NULL, lease_expires = NULL, last_error = 'lease expired', updated = ? "
+                'WHERE state = ? AND lease_expires < ?',
+                (self.max_attempts, FAILED, PENDING, now, LEASED, now)
+            )
+            urls = [row[0] for row in conn.execute(
+                'SELECT url FROM jobs WHERE state = ? ORDER BY attempts, rowid LIMIT ?', (PENDING, limit)
+            )]
+            conn.executemany(
+                'UPDATE jobs SET state = ?, attempts = attempts + 1, lease_owner = ?, lease_expires = ?, '
+                'updated = ? WHERE url = ?',
+                [(LEASED, worker_id, now + self.lease_seconds, now, url) for url in urls]
+            )
+            return urls
+        return self._transaction(lease)
+
+    def renew(self, url, worker_id):
+        """Extends a lease that is still held by `worker_id`. Returns False if it was lost."""
+        def extend(conn):
+            now = time.time()
+            return conn.execute(
+                'UPDATE jobs SET lease_expires = ?, updated = ? WHERE url = ? AND state = ? AND lease_owner = ?',
+                (now + self.lease_seconds, now, url, LEASED, worker_id)
+            ).rowcount == 1
+        return self._transaction(extend)
+
+    def complete(self, url, worker_id, md_path=None):
+        """Marks a leased URL done, with its page name in the page store. Returns False if the lease had expired and moved on."""
+        def finish(conn):
+            return conn.execute(
+                'UPDATE jobs SET state = ?, lease_owner = NULL, lease_expires = NULL, last_error = NULL, '
+                'md_path = ?, updated = ? WHERE url = ? AND state = ? AND lease_owner = ?',
+                (DONE, md_path, time.time(), url, LEASED, worker_id)
+            ).rowcount == 1
+        return self._transaction(finish)
+
+    def fail(self, url, worker_id, error):
+        """Records a failed attempt; the URL is re-queued until it runs out of attempts."""
+        def record(conn):
+            return conn.execute(
+                'UPDATE jobs SET state = CASE WHEN attempts >= ? THEN ? ELSE ? END, lease_owner = NULL, '
+                'lease_expires = NULL, last_error = ?, updated = ? WHERE url = ? AND state = ? AND lease_owner = ?',
+                (self.max_attempts, FAILED, PENDING, error, time.time(), url, LEASED, worker_id)
+            ).rowcount == 1
+        return self._transaction(record)
+
+    def retry_failed(self):
+        """Puts every failed URL back in the queue with a fresh attempt count. Returns how many."""
+        def reset(conn):
+            return conn.execute(
+                'UPDATE jobs SET state = ?, attempts = 0, updated = ? WHERE state = ?',
+                (PENDING, time.time(), FAILED)
+            ).rowcount
+        return self._transaction(reset)
+
+    def counts(self):
+        """Number of URLs in each state."""
+        with self._lock:
+            rows = self._conn.execute('SELECT state, COUNT(*) FROM jobs GROUP BY state').fetchall()
+        return {PENDING: 0, LEASED: 0, DONE: 0, FAILED: 0, **dict(rows)}
+
+    def failures(self):
+        """(url, last error) pairs of the failed URLs."""
+        with self._lock:
+            return self._conn.execute(
+                'SELECT url, last_error FROM jobs WHERE state = ? ORDER BY url', (FAILED,)
+            ).fetchall()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
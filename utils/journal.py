@@ -0,0 +1,77 @@
+import os
+import json
+import base64
+import threading
+import numpy as np
+
+class EmbeddingJournal:
+    """
+    Append-only checkpoint of the embeddings of one job.
+
+    Each finished batch is appended as one JSON line and synced to disk, so a
+    job that dies part way can be restarted and only embed what is missing.
+    Keys are the same as `EmbeddingCache.make_key`, and `get_many`/`put_many`
+    mirror the cache so the embedder can consult both.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries = {}
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        if os.path.exists(path):
+            self._replay()
+        self._file = open(path, 'a')
+
+    def _replay(self):
+        valid_bytes = 0
+        with open(self.path, 'rb') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A crash mid-write leaves a torn last line; its batch is simply embedded again
+                    break
+                if not line.endswith(b'\n'):
+                    break
+                values = np.frombuffer(base64.b64decode(record['values']), dtype=np.float32)
+                for key, vector in zip(record['keys'], values.reshape(len(record['keys']), -1)):
+                    self._entries[key] = vector.tolist()
+                valid_bytes += len(line)
+        # Cut the torn line off so new batches start on a line of their own
+        os.truncate(self.path, valid_bytes)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get_many(self, keys):
+        """Returns a dict of key -> embedding for the keys already journaled."""
+        with self._lock:
+            return {key: self._entries[key] for key in keys if key in self._entries}
+
+    def put_many(self, items):
+        """Appends one batch of (key, embedding) pairs and syncs it to disk."""
+        items = list(items)
+        if not items:
+            return
+        values = np.asarray([embedding for _, embedding in items], dtype=np.float32)
+        line = json.dumps({
+            'keys': [key for key, _ in items],
+            'values': base64.b64encode(values.tobytes()).decode('ascii')
+        })
+        with self._lock:
+            self._file.write(line + '\n')
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            for key, embedding in items:
+                self._entries[key] = embedding
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+    def discard(self):
+        """Closes and deletes the journal once its job has written all of its output."""
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
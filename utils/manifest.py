@@ -0,0 +1,86 @@
+import os
+import json
+import time
+import hashlib
+import threading
+import contextlib
+
+try:
+    import fcntl
+except ImportError:
+    # No inter-process lock on Windows; each process still writes the file atomically
+    fcntl = None
+
+class ScrapeManifest:
+    """
+    Record of every scraped URL: when it was last fetched, a hash of its
+    markdown and the file name it was written to.
+
+    Stored as a JSON object keyed by URL so it can be inspected and edited by hand.
+    """
+
+    def __init__(self, path='./manifest.json'):
+        self.path = path
+        self._lock = threading.Lock()
+        try:
+            with open(path, 'r') as f:
+                self.entries = json.load(f)
+        except FileNotFoundError:
+            self.entries = {}
+
+    @staticmethod
+    def content_hash(markdown):
+        return hashlib.sha256(markdown.encode('utf-8')).hexdigest()
+
+    def is_fresh(self, url, max_age):
+        """True if the URL was fetched less than `max_age` seconds ago."""
+        entry = self.entries.get(url)
+        return entry is not None and time.time() - entry['fetched_at'] < max_age
+
+    def has_changed(self, url, markdown, file_name):
+        """True if `url` is new or its content or output file differs from the last fetch."""
+        previous = self.entries.get(url)
+        return (previous is None
+                or previous['content_hash'] != self.content_hash(markdown)
+                or previous['file_name'] != file_name)
+
+    def update(self, url, markdown, file_name):
+        """Records a successful fetch of `url`."""
+        with self._lock:
+            self.entries[url] = {
+                'fetched_at': time.time(),
+                'content_hash': self.content_hash(markdown),
+                'file_name': file_name
+            }
+
+    @contextlib.contextmanager
+    def _file_lock(self):
+        """Holds an exclusive lock on `<path>.lock` shared by every process saving this manifest."""
+        if fcntl is None:
+            yield
+            return
+        with open(f'{self.path}.lock', 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def save(self):
+        # Read, merge and replace under one lock, so a concurrent save is never lost
+        with self._lock, self._file_lock():
+            # Scrapers in other processes may have saved since we loaded; keep the newest entry per URL
+            try:
+                with open(self.path, 'r') as f:
+                    on_disk = json.load(f)
+            except (FileNotFoundError, ValueError):
+                on_disk = {}
+            for url, entry in on_disk.items():
+                if url not in self.entries or entry['fetched_at'] > self.entries[url]['fetched_at']:
+                    self.entries[url] = entry
+            data = json.dumps(self.entries, indent=2, sort_keys=True)
+            # Write to a temporary file first so an interrupted run never leaves a truncated manifest
+            tmp_path = f'{self.path}.{os.getpid()}.tmp'
+            with open(tmp_path, 'w') as f:
+                f.write(data)
+            os.replace(tmp_path, self.path)
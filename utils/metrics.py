@@ -0,0 +1,167 @@
+import json
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Latency buckets in seconds, from fast local calls up to long rate-limit waits
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{value}"' for name, value in pairs) + '}'
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th quantile."""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= target:
+                return bound
+        return self.max
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'sum': round(self.sum, 4),
+            'mean': round(self.sum / self.count, 4) if self.count else 0.0,
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+            'max': round(self.max, 4),
+        }
+
+
+class Metrics:
+    """
+    Thread-safe registry of counters and histograms, keyed by name and labels.
+
+    Exported as a JSON run report (`report`) or in the Prometheus text format
+    (`to_prometheus`, `serve`).
+    """
+
+    def __init__(self, prefix='hr_tools'):
+        self.prefix = prefix
+        self.started = time.time()
+        self._counters = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name, value=1, **labels):
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            key = _label_key(labels)
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            key = _label_key(labels)
+            if key not in series:
+                series[key] = Histogram()
+            series[key].observe(value)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """Observes the duration of the block in seconds, whether or not it raises."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def counter(self, name, **labels):
+        with self._lock:
+            return self._counters.get(name, {}).get(_label_key(labels), 0)
+
+    def report(self):
+        """Structured snapshot of every series, suitable for a JSON run report."""
+        with self._lock:
+            return {
+                'started': self.started,
+                'elapsed_seconds': round(time.time() - self.started, 2),
+                'counters': {
+                    name: [{'labels': dict(key), 'value': round(value, 4)} for key, value in series.items()]
+                    for name, series in self._counters.items()
+                },
+                'histograms': {
+                    name: [{'labels': dict(key), **hist.summary()} for key, hist in series.items()]
+                    for name, series in self._histograms.items()
+                },
+            }
+
+    def write_report(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.report(), f, indent=2)
+
+    def to_prometheus(self):
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                metric = f'{self.prefix}_{name}'
+                lines.append(f'# TYPE {metric} counter')
+                for key, value in series.items():
+                    lines.append(f'{metric}{_format_labels(key)} {value}')
+            for name, series in sorted(self._histograms.items()):
+                metric = f'{self.prefix}_{name}'
+                lines.append(f'# TYPE {metric} histogram')
+                for key, hist in series.items():
+                    cumulative = 0
+                    for bound, count in zip(hist.buckets, hist.counts):
+                        cumulative += count
+                        lines.append(f'{metric}_bucket{_format_labels(key, [("le", bound)])} {cumulative}')
+                    lines.append(f'{metric}_bucket{_format_labels(key, [("le", "+Inf")])} {hist.count}')
+                    lines.append(f'{metric}_sum{_format_labels(key)} {hist.sum}')
+                    lines.append(f'{metric}_count{_format_labels(key)} {hist.count}')
+        return '\n'.join(lines) + '\n'
+
+    def serve(self, port, host='0.0.0.0'):
+        """Serves `/metrics` in the Prometheus text format from a daemon thread."""
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                data = metrics.to_prometheus().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+# Process-wide registry used when a component is not given its own
+METRICS = Metrics()
@@ -1,48 +1,58 @@
-import base64
+import os
+import uuid
+import shutil
+import zipfile
+import threading
 
-# Custom stdout to capture tqdm output
+class IncrementalZip:
+    """
+    ZIP archive that files are appended to as soon as they are written.
 
-class StdoutCapture:
-    def __init__(self, queue):
-        self.queue = queue
-        
-    def write(self, text):
-        self.queue.put(text)
-        
-    def flush(self):
-        pass
+    Entries are compressed straight from disk, so memory stays flat however
+    large the archive grows, and the archive is complete the moment the last
+    entry is added.
+    """
 
+    def __init__(self, zip_path):
+        self.zip_path = zip_path
+        self.names = set()
+        self._lock = threading.Lock()
+        self._zip = zipfile.ZipFile(zip_path, 'w', compression=zipfile.ZIP_DEFLATED)
 
-def download_zip(zip_file):
-    """
-    Generates a link to download the given ZIP file.
-    
-    Params:
-    ------
-    zip_file (str): File to download.
-    
-    Returns:
-    -------
-    (str): HTML anchor tag to download the ZIP file.
+    def add(self, path, arcname=None):
+        """Adds a file once; re-adding the same archive name is ignored."""
+        arcname = arcname or os.path.normpath(path)
+        with self._lock:
+            if arcname in self.names:
+                return
+            self.names.add(arcname)
+            self._zip.write(path, arcname)
+
+    def writestr(self, arcname, data):
+        with self._lock:
+            self.names.add(arcname)
+            self._zip.writestr(arcname, data)
+
+    def close(self):
+        with self._lock:
+            self._zip.close()
+        return self.zip_path
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def run_archive_path(file_name, previous=None, directory='./cache/downloads'):
     """
-    # Read the ZIP file as binary data
-    with open(zip_file, "rb") as f:
-        zip_data = f.read()
-
-    # Encode the binary data in base64
-    b64 = base64.b64encode(zip_data).decode()
-
-    # Generate the HTML link for downloading
-    dl_link = f"""
-    <html>
-    <head>
-    <title>Start Auto Download file</title>
-    <script src="https://code.jquery.com/jquery-3.2.1.min.js"></script>
-    <script>
-    $('<a href="data:application/zip;base64,{b64}" download="{zip_file}">')[0].click()
-    </script>
-    </head>
-    </html>
+    Unique path for one run's archive, so concurrent sessions never write the same file.
+
+    `previous` is the same session's earlier archive, removed with its directory.
     """
-    
-    return dl_link
\ No newline at end of file
+    if previous:
+        shutil.rmtree(os.path.dirname(previous), ignore_errors=True)
+    run_dir = os.path.join(directory, uuid.uuid4().hex)
+    os.makedirs(run_dir)
+    return os.path.join(run_dir, file_name)
@@ -0,0 +1,229 @@
+import os
+import gzip
+import json
+import time
+import uuid
+import threading
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# A shard is closed and a new one started once it grows past this size
+SHARD_BYTES = 64 * 2**20
+INDEX_NAME = 'index.jsonl'
+
+def _compress(data, codec, level):
+    if codec == 'zstd':
+        return zstandard.ZstdCompressor(level=level).compress(data)
+    return gzip.compress(data, compresslevel=min(level, 9), mtime=0)
+
+def _decompress(data, codec):
+    if codec == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("This page was stored with zstd; install the zstandard package to read it")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+def page_text(record):
+    """The page as the embedder reads it: its URL on the first line, then the markdown."""
+    response = record['response']
+    return f"{response['metadata']['url']}\n{response['markdown']}"
+
+
+class PageStore:
+    """
+    Append-only, compressed storage for scraped pages.
+
+    Each page is one independently compressed record (zstd, or gzip without
+    the zstandard package) appended to a shard file, and one line in
+    `index.jsonl` gives its shard, offset and length. Any page can be read
+    by URL or by name (`<slug>.md`) with a single seek, and `iter_pages`
+    streams them shard by shard.
+
+    Every store instance appends to shards of its own and writes each index
+    line with a single append, so several scrape workers can share a
+    directory. Call `close` when done writing.
+    A page scraped again is appended; the index keeps its latest record.
+    """
+
+    def __init__(self, directory='./pages', shard_bytes=SHARD_BYTES, level=3):
+        self.directory = directory
+        self.shard_bytes = shard_bytes
+        self.level = level
+        self.codec = 'zstd' if zstandard is not None else 'gzip'
+        os.makedirs(directory, exist_ok=True)
+        self.index_path = os.path.join(directory, INDEX_NAME)
+        self._lock = threading.Lock()
+        self._by_url = {}
+        self._by_name = {}
+        self._index_position = 0
+        self._shard = None
+        self._index_fd = None
+        self.refresh()
+
+    def refresh(self):
+        """Loads index lines appended since the last call, including other processes' pages."""
+        if not os.path.exists(self.index_path):
+            return
+        with self._lock, open(self.index_path, 'rb') as f:
+            f.seek(self._index_position)
+            for line in f:
+                # A line still being written, or torn by a crash, is left for the next call
+                if not line.endswith(b'\n'):
+                    break
+                self._index_position += len(line)
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                self._by_url[entry['url']] = entry
+                self._by_name[entry['name']] = entry
+
+    def _entry(self, key):
+        entry = self._by_url.get(key) or self._by_name.get(key)
+        if entry is None:
+            self.refresh()
+            entry = self._by_url.get(key) or self._by_name.get(key)
+        if entry is None:
+            raise KeyError(key)
+        return entry
+
+    def __contains__(self, key):
+        try:
+            self._entry(key)
+            return True
+        except KeyError:
+            return False
+
+    def __len__(self):
+        return len(self._by_url)
+
+    def names(self):
+        """Names of the stored pages, in the order they were first stored."""
+        return list(self._by_name)
+
+    def _open_shard(self):
+        extension = 'zst' if self.codec == 'zstd' else 'gz'
+        # Unique per store instance, so two stores in one process never share a shard
+        name = f"pages-{time.strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex}.{extension}"
+        self._shard = open(os.path.join(self.directory, name), 'ab')
+
+    def _append_index(self, line):
+        if self._index_fd is None:
+            self._index_fd = os.open(self.index_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            # Start on a fresh line if a crashed writer left a torn one
+            size = os.fstat(self._index_fd).st_size
+            if size:
+                with open(self.index_path, 'rb') as f:
+                    f.seek(size - 1)
+                    if f.read(1) != b'\n':
+                        line = b'\n' + line
+        # One write per line, so lines of concurrent writers never interleave
+        os.write(self._index_fd, line)
+
+    def put(self, url, name, response):
+        """
+        Appends a scraped page and indexes it under its URL and name.
+
+        Params:
+        ------
+        url (str): The URL that was scraped.
+        name (str): The page's file name, e.g. 'some_article.md'.
+        response (dict): The Firecrawl response, stored as is.
+
+        Returns:
+        -------
+        (int): Compressed size of the record in bytes.
+        """
+        record = json.dumps({'url': url, 'name': name, 'scraped_at': time.time(), 'response': response},
+                            separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+        data = _compress(record, self.codec, self.level)
+        with self._lock:
+            if self._shard is None or os.fstat(self._shard.fileno()).st_size >= self.shard_bytes:
+                if self._shard is not None:
+                    self._shard.close()
+                self._open_shard()
+            fd = self._shard.fileno()
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                # The record starts at the real end of the file, whoever else appended to it
+                offset = os.fstat(fd).st_size
+                self._shard.write(data)
+                self._shard.flush()
+                # The record is on disk before the index line that points to it
+                os.fsync(fd)
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+            entry = {'url': url, 'name': name, 'shard': os.path.basename(self._shard.name),
+                     'offset': offset, 'length': len(data), 'codec': self.codec}
+            self._append_index((json.dumps(entry, separators=(',', ':'), ensure_ascii=False) + '\n').encode('utf-8'))
+            self._by_url[url] = entry
+            self._by_name[name] = entry
+        return len(data)
+
+    def _read(self, f, entry):
+        f.seek(entry['offset'])
+        return json.loads(_decompress(f.read(entry['length']), entry['codec']))
+
+    def get(self, key):
+        """The stored record of a page ({'url', 'name', 'scraped_at', 'response'}), by URL or name."""
+        entry = self._entry(key)
+        with open(os.path.join(self.directory, entry['shard']), 'rb') as f:
+            return self._read(f, entry)
+
+    def text(self, key):
+        """The page's text as the embedder reads it, by URL or name."""
+        return page_text(self.get(key))
+
+    def iter_pages(self, keys=None):
+        """
+        Streams the latest record of each page, or of the pages in `keys`.
+
+        Records are read in shard and offset order, opening each shard once,
+        and only one page is decompressed in memory at a time.
+
+        Returns:
+        -------
+        (Iterator[dict]): Page records, as returned by `get`.
+        """
+        self.refresh()
+        if keys is None:
+            entries = list(self._by_url.values())
+        else:
+            entries = list({id(entry): entry for entry in map(self._entry, keys)}.values())
+        entries.sort(key=lambda entry: (entry['shard'], entry['offset']))
+        f, shard = None, None
+        try:
+            for entry in entries:
+                if entry['shard'] != shard:
+                    if f is not None:
+                        f.close()
+                    shard = entry['shard']
+                    f = open(os.path.join(self.directory, shard), 'rb')
+                yield self._read(f, entry)
+        finally:
+            if f is not None:
+                f.close()
+
+    def iter_texts(self, keys=None):
+        """(name, text) pairs of the stored pages, in the form `Embedder.split_texts` takes."""
+        for record in self.iter_pages(keys):
+            yield record['name'], page_text(record)
+
+    def close(self):
+        with self._lock:
+            if self._shard is not None:
+                self._shard.close()
+                self._shard = None
+            if self._index_fd is not None:
+                os.close(self._index_fd)
+                self._index_fd = None
@@ -0,0 +1,62 @@
+import pinecone
+from typing import List, Dict
+from utils.clients import get_pinecone, get_index, METADATA_CACHE, INDEX_LIST_TTL, INDEX_STATS_TTL
+
+class PineconeManager:
+    """
+    Pinecone helpers for the tools. Clients are pooled per API key and index
+    listings and stats are cached briefly (see utils.clients), so building a
+    manager on every Streamlit rerun costs no round trips.
+    """
+
+    def __init__(self, api_key: str):
+        self.api_key = api_key
+        self.pinecone = get_pinecone(api_key)
+
+    def index_dimensions(self) -> Dict[str, int]:
+        """Dimension of every index in the project, by index name."""
+        try:
+            return METADATA_CACHE.get(
+                ('indexes', self.api_key),
+                lambda: {index.name: index.dimension for index in self.pinecone.list_indexes()},
+                INDEX_LIST_TTL
+            )
+        except Exception as e:
+            raise ConnectionError(str(e)) from e
+
+    def list_indexes(self) -> List[str]:
+        return list(self.index_dimensions())
+
+    def index_exists(self, index_name: str) -> bool:
+        return index_name in self.list_indexes()
+
+    def connect_index(self, index_name: str):
+        try:
+            return get_index(self.api_key, index_name)
+        except pinecone.exceptions.NotFoundException as e:
+            raise ValueError(f"Index '{index_name}' not found. Please create it first through Pinecone console.") from e
+
+    def index_stats(self, index_name: str) -> Dict:
+        """Dimension and vector counts of an index, overall and per namespace."""
+        def load():
+            stats = self.connect_index(index_name).describe_index_stats()
+            return {
+                'dimension': stats.dimension,
+                'total_vector_count': stats.total_vector_count,
+                'namespaces': {name: ns.vector_count for name, ns in (stats.namespaces or {}).items()}
+            }
+        return METADATA_CACHE.get(('stats', self.api_key, index_name), load, INDEX_STATS_TTL)
+
+    def check_dimension(self, index_name: str, dimension: int):
+        """Raises ValueError if vectors of `dimension` cannot be upserted into the index."""
+        expected = self.index_stats(index_name)['dimension']
+        if dimension != expected:
+            raise ValueError(f"Vectors have {dimension} dimensions but index '{index_name}' expects {expected}")
+
+    def invalidate(self, index_name: str = None):
+        """Forgets cached stats after writing to an index (or every cached listing without a name)."""
+        if index_name:
+            METADATA_CACHE.invalidate('stats', self.api_key, index_name)
+        else:
+            METADATA_CACHE.invalidate('indexes', self.api_key)
+            METADATA_CACHE.invalidate('stats', self.api_key)
@@ -0,0 +1,116 @@
+import time
+import asyncio
+import threading
+from utils.metrics import METRICS
+
+class RateLimiter:
+    """
+    Token-bucket limiter over requests per minute and, optionally, tokens per minute.
+
+    The same instance can be shared by threads (`acquire`) and coroutines
+    (`acquire_async`). When the API answers with a 429, `throttle` pauses
+    every caller and halves the refill rate, which then recovers gradually
+    as calls succeed.
+    """
+
+    def __init__(self, requests_per_minute, tokens_per_minute=None, name='api', metrics=None):
+        self.name = name
+        self.metrics = metrics or METRICS
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._request_allowance = float(requests_per_minute)
+        self._token_allowance = float(tokens_per_minute or 0)
+        self._scale = 1.0
+        self._blocked_until = 0.0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.slept = 0.0
+
+    def _refill(self, now):
+        elapsed = now - self._updated
+        self._updated = now
+        self._request_allowance = min(
+            self.requests_per_minute,
+            self._request_allowance + elapsed * self.requests_per_minute * self._scale / 60
+        )
+        if self.tokens_per_minute:
+            self._token_allowance = min(
+                self.tokens_per_minute,
+                self._token_allowance + elapsed * self.tokens_per_minute * self._scale / 60
+            )
+
+    def _reserve(self, tokens):
+        """Consumes one request (and `tokens`) if available, otherwise returns the seconds to wait."""
+        with self._lock:
+            now = time.monotonic()
+            if now < self._blocked_until:
+                return self._blocked_until - now
+            self._refill(now)
+
+            wait = 0.0
+            if self._request_allowance < 1:
+                wait = (1 - self._request_allowance) * 60 / (self.requests_per_minute * self._scale)
+            if self.tokens_per_minute:
+                # A single request larger than the whole bucket only has to wait for a full bucket
+                tokens = min(tokens, self.tokens_per_minute)
+                if self._token_allowance < tokens:
+                    wait = max(wait, (tokens - self._token_allowance) * 60 / (self.tokens_per_minute * self._scale))
+            if wait > 0:
+                return wait
+
+            self._request_allowance -= 1
+            if self.tokens_per_minute:
+                self._token_allowance -= tokens
+            return 0.0
+
+    def acquire(self, tokens=0):
+        """Blocks until a request may be sent and returns the seconds spent waiting."""
+        waited = 0.0
+        while True:
+            wait = self._reserve(tokens)
+            if wait <= 0:
+                return waited
+            waited += wait
+            self.slept += wait
+            self.metrics.inc('rate_limit_sleep_seconds_total', wait, service=self.name)
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens=0):
+        waited = 0.0
+        while True:
+            wait = self._reserve(tokens)
+            if wait <= 0:
+                return waited
+            waited += wait
+            self.slept += wait
+            self.metrics.inc('rate_limit_sleep_seconds_total', wait, service=self.name)
+            await asyncio.sleep(wait)
+
+    def throttle(self, retry_after=None):
+        """Records a rate-limit response: pause all callers and slow the refill rate."""
+        self.metrics.inc('rate_limited_total', service=self.name)
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._scale = max(0.1, self._scale / 2)
+            if retry_after:
+                self._blocked_until = max(self._blocked_until, now + retry_after)
+
+    def record_success(self):
+        with self._lock:
+            self._scale = min(1.0, self._scale * 1.05)
+
+
+def retry_after_seconds(error):
+    """Reads the retry delay from an API error's `retry-after-ms`/`retry-after` headers, if any."""
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None) or {}
+    try:
+        if headers.get('retry-after-ms'):
+            return float(headers['retry-after-ms']) / 1000
+        if headers.get('retry-after'):
+            return float(headers['retry-after'])
+    except ValueError:
+        # retry-after may also be an HTTP date; fall back to our own backoff
+        return None
+    return None
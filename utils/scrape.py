@@ -1,62 +1,287 @@
-from firecrawl import FirecrawlApp
 import os, json, argparse
 from tqdm import tqdm
 import shutil
 import time
+import random
+import threading
+import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from utils.rate_limit import RateLimiter, retry_after_seconds
+from utils.manifest import ScrapeManifest
+from utils.metrics import METRICS
+from utils.events import ScrapeStarted, PageDone, Throttled, PageFailed, ScrapeFinished, describe
+from utils.job_queue import default_worker_id
+from utils.clients import get_firecrawl
+from utils.page_store import PageStore
+
+SCRAPE_PARAMS = {
+    'formats': ['markdown'],
+    # 'includeTags': ['article', '#main-content'] # <- For old website
+    'includeTags': ['h1.heading-2', 'div.vc_row.wpb_row.vc_row-fluid.hr-article-template.es-import']
+}
+
+# Firecrawl statuses worth another attempt; anything else (401 bad key, 402/403 plan or
+# credits, 404) fails the URL at once rather than spending the rate limit on retries
+RETRYABLE_STATUS = {408, 429}
+
+def is_retryable(error):
+    """True for rate limits, timeouts, server errors and dropped connections."""
+    if isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+        return True
+    status_code = getattr(getattr(error, 'response', None), 'status_code', None)
+    return status_code is not None and (status_code in RETRYABLE_STATUS or status_code >= 500)
+
+def read_urls(file_path):
+    """URLs of a text file with one per line, skipping blanks and '#' or '//' comments."""
+    with open(file_path, "r") as file:
+        return [line.strip() for line in file if line.strip() and
+                not line.strip().startswith(('#', '//'))]
+
 
 class Scrape:
-    def __init__(self, file_path, api_key):
+    def __init__(self, file_path, api_key, max_workers=4, requests_per_minute=10, max_retries=3,
+                 manifest_path='./manifest.json', freshness_hours=0, api_url=None,
+                 metrics=None, on_event=None, store=None, defer_manifest=False):
         self.api_key = api_key
+        # Receives utils.events progress events; without one they are printed
+        self.on_event = on_event
         self.file_path = file_path
         self.urls = []
+        self.failed = []
+        self.changed = []
+        self.skipped = []
+        # URLs fetched within the freshness window are not scraped again
+        self.manifest = ScrapeManifest(manifest_path)
+        # With defer_manifest, changed pages are only recorded by commit_pages, once the caller
+        # has processed them; until then a later run still sees them as changed
+        self.defer_manifest = defer_manifest
+        self.pending = {}
+        self._pending_lock = threading.Lock()
+        # Pages are appended to compressed shards rather than written as files (see utils.page_store)
+        self.store = store if store is not None else PageStore()
+        self.freshness_hours = freshness_hours
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        # One client is shared by every worker; the limiter should match the Firecrawl plan
+        self.app = get_firecrawl(self.api_key, api_url)
+        self.metrics = metrics or METRICS
+        self.limiter = RateLimiter(requests_per_minute, name='firecrawl', metrics=self.metrics)
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        """Stops workers from starting any further requests."""
+        self._cancelled.set()
+
+    def _emit(self, event):
+        if self.on_event:
+            self.on_event(event)
+        elif not isinstance(event, Throttled):
+            print(describe(event))
 
     def extract_urls(self):
         """Extract URLs from the file (renamed from read_urls_from_file to match the interface)"""
         try:
-            with open(self.file_path, "r") as file:
-                self.urls = [line.strip() for line in file if line.strip() and 
-                        not line.strip().startswith(('#', '//'))]
-                return self.urls
+            self.urls = read_urls(self.file_path)
+            return self.urls
         except FileNotFoundError:
             print(f"Error: File '{self.file_path}' not found.")
             self.urls = []
             return self.urls
 
+    def _fetch(self, url, keep_alive=None):
+        """
+        Scrapes a single URL, retrying transient failures (see `is_retryable`) with exponential backoff.
 
-    def scrape_websites(self):
-        counter = 1
-        for url in tqdm(self.urls, desc="Scraping URLs"):
+        `keep_alive` is called before each request, after any rate-limit wait,
+        so a caller holding a lease on the URL can renew it.
+        """
+        for attempt in range(self.max_retries + 1):
+            if self._cancelled.is_set():
+                raise RuntimeError("Scraping cancelled")
+            waited = self.limiter.acquire()
+            if waited >= 1:
+                self._emit(Throttled(url, waited, 'rate limit'))
+            if keep_alive:
+                keep_alive()
             try:
-                app = FirecrawlApp(api_key=self.api_key)
-
-                response = app.scrape_url(url=url, params={
-                    'formats': ['markdown'],
-                    # 'includeTags': ['article', '#main-content'] # <- For old website
-                    'includeTags': ['h1.heading-2', 'div.vc_row.wpb_row.vc_row-fluid.hr-article-template.es-import']
-                })
-
-                # title = response['metadata']['ogTitle'] # <- For old website
-                title = response['markdown'].split("\n")[0].replace('#','').strip()
-                print(f"Scraping page: {counter}. {title}")
-                title = title.replace(' ', '_').lower()
-                title = ''.join(e for e in title if e.isalnum() or e == '_')
-
-                
-                os.makedirs('./json', exist_ok=True)
-                os.makedirs('./md', exist_ok=True)
-
-                with open(f'./json/{title}.json', 'w') as json_file, \
-                    open(f'./md/{title}.md', 'w') as md:
-                    
-                    md.write(f'{response["metadata"]["url"]}\n')
-                    md.write(response['markdown'])
-                    json.dump(response, json_file, indent=4)
-                
-                if counter%10 == 0:
-                    print("Sleeping for 70 seconds")
-                    time.sleep(70)
-
-                counter+=1
+                with self.metrics.timer('api_latency_seconds', service='firecrawl'):
+                    response = self.app.scrape_url(url=url, params=SCRAPE_PARAMS)
+                self.limiter.record_success()
+                return response
             except Exception as e:
-                print(f"Error: {e}")
-                break
\ No newline at end of file
+                self.metrics.inc('api_errors_total', service='firecrawl')
+                if attempt == self.max_retries or not is_retryable(e):
+                    raise
+                self.metrics.inc('api_retries_total', service='firecrawl')
+                delay = retry_after_seconds(e)
+                status_code = getattr(getattr(e, 'response', None), 'status_code', None)
+                if status_code == 429:
+                    self.limiter.throttle(delay)
+                if delay is None:
+                    delay = min(60, 2 ** attempt) + random.random()
+                self.metrics.inc('backoff_seconds_total', delay, service='firecrawl')
+                self._emit(Throttled(url, delay, '429' if status_code == 429 else f'retry after error: {e}'))
+                time.sleep(delay)
+
+    def _save(self, url, response):
+        """
+        Appends the scraped page to the page store if its content changed.
+
+        Returns:
+        -------
+        (tuple[str, str, bool]): The page title, its name in the store and whether it changed.
+        """
+        # title = response['metadata']['ogTitle'] # <- For old website
+        title = response['markdown'].split("\n")[0].replace('#','').strip()
+        file_title = title.replace(' ', '_').lower()
+        file_title = ''.join(e for e in file_title if e.isalnum() or e == '_')
+
+        name = f'{file_title}.md'
+        if not self.manifest.has_changed(url, response['markdown'], name) and name in self.store:
+            self.manifest.update(url, response['markdown'], name)
+            return title, name, False
+
+        self.metrics.inc('bytes_written_total', self.store.put(url, name, response), stage='scrape')
+        if self.defer_manifest:
+            with self._pending_lock:
+                self.pending[url] = (response['markdown'], name)
+        else:
+            self.manifest.update(url, response['markdown'], name)
+        return title, name, True
+
+    def commit_pages(self):
+        """Records the changed pages held back by `defer_manifest` in the manifest and saves it."""
+        with self._pending_lock:
+            pending, self.pending = self.pending, {}
+        for url, (markdown, name) in pending.items():
+            self.manifest.update(url, markdown, name)
+        self.manifest.save()
+        return len(pending)
+
+    def scrape_websites(self, on_page=None):
+        """
+        Scrapes every URL across a pool of workers.
+
+        Params:
+        ------
+        on_page (callable): Called from the worker thread with (url, name) for every changed page;
+            its text is `self.store.text(name)`.
+            Progress is reported through `on_event` (see utils.events).
+
+        Returns:
+        -------
+        (list[tuple[str, str]]): (url, error) pairs for the URLs that still failed after retries.
+            Pages whose content changed are listed in `self.changed` by name,
+            and URLs skipped as still fresh in `self.skipped`.
+        """
+        self.failed = []
+        self.changed = []
+        max_age = self.freshness_hours * 3600
+        self.skipped = [url for url in self.urls if self.manifest.is_fresh(url, max_age)]
+        urls = [url for url in self.urls if not self.manifest.is_fresh(url, max_age)]
+        counter = 0
+        counter_lock = threading.Lock()
+        self._emit(ScrapeStarted(len(urls), len(self.skipped)))
+
+        def work(url):
+            nonlocal counter
+            with self.metrics.timer('file_seconds', stage='scrape'):
+                title, name, changed = self._save(url, self._fetch(url))
+            with counter_lock:
+                counter += 1
+                completed = counter
+                if changed:
+                    self.changed.append(name)
+            self._emit(PageDone(url, title, name, changed, completed, len(urls)))
+            if changed and on_page:
+                on_page(url, name)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(work, url): url for url in urls}
+            for future in tqdm(as_completed(futures), total=len(futures), desc="Scraping URLs"):
+                url = futures[future]
+                try:
+                    future.result()
+                except Exception as e:
+                    # A failed URL is recorded and the rest of the run continues
+                    self.failed.append((url, str(e)))
+                    self.metrics.inc('pages_failed_total', stage='scrape')
+                    with counter_lock:
+                        counter += 1
+                        completed = counter
+                    self._emit(PageFailed(url, str(e), completed, len(urls)))
+
+        self.manifest.save()
+        self._emit(ScrapeFinished(len(urls) - len(self.failed), len(self.failed), len(self.changed)))
+        return self.failed
+
+    def scrape_queue(self, job_queue, worker_id=None, on_page=None):
+        """
+        Scrapes URLs claimed from a shared `JobQueue` until none are left to claim.
+
+        Any number of processes can run this against the same queue file. Each
+        URL is marked done or failed in the queue as it finishes; URLs still
+        fresh in the manifest are marked done without a request.
+
+        Returns:
+        -------
+        (list[tuple[str, str]]): (url, error) pairs for the URLs this worker failed on.
+        """
+        worker_id = worker_id or default_worker_id()
+        self.failed = []
+        self.changed = []
+        self.skipped = []
+        max_age = self.freshness_hours * 3600
+        counts = job_queue.counts()
+        total = counts['pending'] + counts['leased']
+        counter = 0
+        counter_lock = threading.Lock()
+        self._emit(ScrapeStarted(total, 0))
+
+        def work():
+            nonlocal counter
+            while not self._cancelled.is_set():
+                claimed = job_queue.claim(worker_id)
+                if not claimed:
+                    return
+                url = claimed[0]
+                if self.manifest.is_fresh(url, max_age):
+                    job_queue.complete(url, worker_id)
+                    with counter_lock:
+                        self.skipped.append(url)
+                    continue
+
+                def keep_alive():
+                    # Rate-limit waits and backoff can outlast the lease; stop if another worker took over
+                    if not job_queue.renew(url, worker_id):
+                        raise RuntimeError("Lease expired and the URL was handed to another worker")
+
+                try:
+                    with self.metrics.timer('file_seconds', stage='scrape'):
+                        title, name, changed = self._save(url, self._fetch(url, keep_alive))
+                except Exception as e:
+                    job_queue.fail(url, worker_id, str(e))
+                    self.metrics.inc('pages_failed_total', stage='scrape')
+                    with counter_lock:
+                        self.failed.append((url, str(e)))
+                        counter += 1
+                        completed = counter
+                    self._emit(PageFailed(url, str(e), completed, total))
+                    continue
+                job_queue.complete(url, worker_id, name)
+                with counter_lock:
+                    counter += 1
+                    completed = counter
+                    if changed:
+                        self.changed.append(name)
+                self._emit(PageDone(url, title, name, changed, completed, total))
+                if changed and on_page:
+                    on_page(url, name)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for future in [executor.submit(work) for _ in range(self.max_workers)]:
+                future.result()
+
+        self.manifest.save()
+        self._emit(ScrapeFinished(counter - len(self.failed), len(self.failed), len(self.changed)))
+        return self.failed
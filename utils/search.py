@@ -0,0 +1,340 @@
+import os
+import json
+import numpy as np
+from utils.stream_json import iter_json_array
+from utils.vector_store import (
+    VALUES_SUFFIX, META_SUFFIX, SCALE_SUFFIX, is_values_file, load_values, iter_metadata, quantize, dequantize
+)
+
+# Rows converted and scored per block, to bound temporary memory on large or quantized matrices
+BLOCK_ROWS = 65536
+
+# Quantized searches rescore this many times `k` candidates at full precision
+RESCORE_FACTOR = 4
+
+def _name(source):
+    return os.path.basename(source) if isinstance(source, (str, os.PathLike)) else source.name
+
+def source_dimensions(sources):
+    """
+    Vector size of each embedding file, read from the `.npy` header or the first JSON vector.
+
+    Returns:
+    -------
+    (dict[str, int]): File name -> dimensions, for the JSON and `.npy` value files.
+    """
+    dimensions = {}
+    for source in sources:
+        name = _name(source)
+        if name.endswith('.json'):
+            f = open(source, 'rb') if isinstance(source, (str, os.PathLike)) else source
+            try:
+                f.seek(0)
+                first = next(iter_json_array(f), None)
+            finally:
+                if f is not source:
+                    f.close()
+            dimensions[name] = len(first['values']) if first else 0
+        elif is_values_file(name):
+            dimensions[name] = load_values(source).shape[-1]
+    return dimensions
+
+def load_matrix(sources, dimension=None):
+    """
+    Loads embedding files into one matrix and its metadata records.
+
+    `sources` are paths or uploaded files: JSON files from `Embedder.write_files`
+    or `.npy` matrices with their `.meta.jsonl` tables (and `.scale.npy` for
+    int8). A single `.npy` file is used in place (memory-mapped or viewed);
+    anything else is packed into one contiguous array, kept quantized when
+    every file shares the same precision. Files of several sizes (see
+    `Embedder.output_dimensions`) need a `dimension` to pick one of them.
+
+    Returns:
+    -------
+    (tuple[np.ndarray, list[dict], np.ndarray | None]): The (n, dimensions)
+        matrix, the {'id', 'metadata'} record of each row and the int8 row scales.
+    """
+    by_name = {_name(source): source for source in sources}
+    if dimension is not None:
+        keep = {name for name, d in source_dimensions(sources).items() if d == dimension}
+    blocks, scales, records = [], [], []
+    for name, source in by_name.items():
+        if dimension is not None and (name.endswith('.json') or is_values_file(name)) and name not in keep:
+            continue
+        if name.endswith('.json'):
+            if isinstance(source, (str, os.PathLike)):
+                with open(source, 'r') as f:
+                    vectors = json.load(f)
+            else:
+                source.seek(0)
+                vectors = list(iter_json_array(source))
+            blocks.append(np.asarray([vector['values'] for vector in vectors], dtype=np.float32))
+            scales.append(None)
+            records += [{'id': vector['id'], 'metadata': vector['metadata']} for vector in vectors]
+        elif is_values_file(name):
+            stem = name[:-len(VALUES_SUFFIX)]
+            if stem + META_SUFFIX not in by_name:
+                raise ValueError(f"Missing metadata table '{stem + META_SUFFIX}' for '{name}'")
+            values = load_values(source)
+            if values.dtype == np.int8 and stem + SCALE_SUFFIX not in by_name:
+                raise ValueError(f"Missing scale table '{stem + SCALE_SUFFIX}' for '{name}'")
+            meta = list(iter_metadata(by_name[stem + META_SUFFIX]))
+            if len(meta) != len(values):
+                raise ValueError(f"'{name}' has {len(values)} rows but its metadata table has {len(meta)} records")
+            blocks.append(values)
+            scales.append(load_values(by_name[stem + SCALE_SUFFIX]) if values.dtype == np.int8 else None)
+            records += meta
+
+    if not blocks:
+        raise ValueError("No embedding files to load")
+    sizes = sorted({block.shape[1] for block in blocks})
+    if len(sizes) > 1:
+        raise ValueError(f"The files hold vectors of {', '.join(map(str, sizes))} dimensions; pick one size to load")
+    if len(blocks) == 1:
+        return blocks[0], records, scales[0]
+    if len({block.dtype for block in blocks}) == 1:
+        return np.concatenate(blocks), records, np.concatenate(scales) if scales[0] is not None else None
+    # Mixed precisions are widened to float32
+    return np.concatenate([dequantize(block, scale) for block, scale in zip(blocks, scales)]), records, None
+
+def list_vector_files(directory):
+    """Paths of every embedding file (JSON, `.npy`, `.scale.npy` and `.meta.jsonl`) in a directory."""
+    return [
+        os.path.join(directory, name) for name in sorted(os.listdir(directory))
+        if name.endswith(('.json', VALUES_SUFFIX, META_SUFFIX))
+    ]
+
+def _normalize(queries):
+    queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+    norms = np.linalg.norm(queries, axis=1, keepdims=True)
+    return queries / np.where(norms == 0, 1, norms)
+
+def _inverse(norms):
+    return np.where(norms == 0, 0, 1 / np.where(norms == 0, 1, norms)).astype(np.float32)
+
+def _top_k(scores, k):
+    """Indices of the k highest scores of each row, best first."""
+    k = min(k, scores.shape[1])
+    if k == 0:
+        return np.empty((len(scores), 0), dtype=np.int64)
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1)
+    return np.take_along_axis(top, order, axis=1)
+
+
+class IVFIndex:
+    """
+    Inverted-file ANN index: rows are bucketed under their nearest k-means
+    centroid, and a query only scores the rows of its `nprobe` closest lists.
+    """
+
+    def __init__(self, index, n_lists=None, iterations=10, sample_size=None, seed=0):
+        n = len(index)
+        self.n_lists = max(1, min(n, n_lists or int(np.sqrt(n))))
+        rng = np.random.default_rng(seed)
+
+        # Spherical k-means on a sample of unit-length rows
+        sample_size = min(n, sample_size or self.n_lists * 64)
+        sample = np.sort(rng.choice(n, sample_size, replace=False))
+        sample = index.rows(sample) * index.inverse_norms[sample, None]
+        centroids = sample[rng.choice(sample_size, self.n_lists, replace=False)]
+        for _ in range(iterations):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            # Empty lists keep their previous centroid
+            centroids = np.where(norms > 0, sums / np.where(norms == 0, 1, norms), centroids)
+        self.centroids = centroids
+
+        # A row's positive scale does not change which centroid is nearest
+        assignment = np.argmax(index.scores(centroids, scaled=False), axis=1)
+        # Rows grouped by list: list i holds rows[offsets[i]:offsets[i + 1]]
+        self.rows = np.argsort(assignment, kind='stable')
+        self.offsets = np.searchsorted(assignment[self.rows], np.arange(self.n_lists + 1))
+
+    def candidates(self, query, nprobe):
+        lists = np.argsort(-(self.centroids @ query))[:nprobe]
+        return np.concatenate([self.rows[self.offsets[i]:self.offsets[i + 1]] for i in lists])
+
+
+class VectorIndex:
+    """
+    Local top-k cosine search over embeddings written by the embedder.
+
+    Exact search scores every row in blocks of matrix products; `build_ann`
+    adds an IVF index for larger corpora. The matrix may be float16 or int8
+    (with per-row `scales`); when `full_values` is given, the best candidates
+    are rescored against it at full precision. Results have the same shape as
+    Pinecone query matches: {'id', 'score', 'metadata'}.
+    """
+
+    def __init__(self, values, records, scales=None, full_values=None):
+        if len(values) != len(records):
+            raise ValueError(f"{len(values)} vectors but {len(records)} metadata records")
+        self.values = values
+        self.records = records
+        self.scales = scales
+        self.full_values = full_values
+        self.dimension = values.shape[1] if values.ndim == 2 else 0
+        # Norms are kept apart so a memory-mapped matrix is never copied to normalize it
+        norms = np.zeros(len(values), dtype=np.float32)
+        for start in range(0, len(values), BLOCK_ROWS):
+            norms[start:start + BLOCK_ROWS] = np.linalg.norm(self.rows(slice(start, start + BLOCK_ROWS)), axis=1)
+        self.inverse_norms = _inverse(norms)
+        self.ann = None
+
+    @classmethod
+    def from_files(cls, sources, dimension=None):
+        return cls(*load_matrix(sources, dimension))
+
+    @classmethod
+    def from_directory(cls, directory, dimension=None):
+        return cls.from_files(list_vector_files(directory), dimension)
+
+    def __len__(self):
+        return len(self.records)
+
+    @property
+    def nbytes(self):
+        """Bytes held by the searched matrix and its scales (not the rescoring matrix)."""
+        return self.values.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    def rows(self, rows):
+        """Float32 copy of the given rows (an index array or a slice)."""
+        return dequantize(self.values[rows], self.scales[rows] if self.scales is not None else None)
+
+    def scores(self, queries, scaled=True):
+        """
+        Dot products of every row with each query, as an (n, m) array.
+
+        Quantized matrices are widened one block at a time, never as a whole.
+        """
+        if self.values.dtype == np.float32:
+            return self.values @ queries.T
+        out = np.empty((len(self.values), len(queries)), dtype=np.float32)
+        for start in range(0, len(self.values), BLOCK_ROWS):
+            block = slice(start, start + BLOCK_ROWS)
+            if scaled:
+                out[block] = self.rows(block) @ queries.T
+            else:
+                out[block] = self.values[block].astype(np.float32) @ queries.T
+        return out
+
+    def quantize(self, dtype):
+        """
+        Quantized copy of this index that rescores its shortlists against this matrix.
+
+        With a memory-mapped float32 matrix, only the quantized copy is held in
+        RAM; rescoring reads just the shortlisted rows from disk.
+        """
+        full_values = self.full_values if self.full_values is not None else self.values
+        if full_values.dtype == np.int8:
+            raise ValueError("Rescoring needs a float matrix; load the float32 or float16 files")
+        values = np.empty(self.values.shape, dtype=np.dtype(dtype))
+        scales = np.empty(len(self.values), dtype=np.float32) if dtype == 'int8' else None
+        for start in range(0, len(self.values), BLOCK_ROWS):
+            block = slice(start, start + BLOCK_ROWS)
+            values[block], block_scales = quantize(self.rows(block), dtype)
+            if scales is not None:
+                scales[block] = block_scales
+        return VectorIndex(values, self.records, scales=scales, full_values=full_values)
+
+    def build_ann(self, n_lists=None, iterations=10, seed=0):
+        self.ann = IVFIndex(self, n_lists=n_lists, iterations=iterations, seed=seed)
+        return self.ann
+
+    def _matches(self, rows, scores):
+        return [
+            {'id': self.records[row]['id'], 'score': float(score), 'metadata': self.records[row]['metadata']}
+            for row, score in zip(rows, scores)
+        ]
+
+    def _rescore(self, query, rows, k):
+        """Exact cosine scores of the candidate rows against the full-precision matrix."""
+        rows = np.sort(rows)
+        full = np.asarray(self.full_values[rows], dtype=np.float32)
+        scores = (full @ query) * _inverse(np.linalg.norm(full, axis=1))
+        top = _top_k(scores[None, :], k)[0]
+        return rows[top], scores[top]
+
+    def search(self, queries, k=10, nprobe=None, rescore=RESCORE_FACTOR):
+        """
+        Finds the `k` rows most similar to each query.
+
+        Params:
+        ------
+        queries (array-like): One query vector or a (m, dimensions) batch.
+        k (int): Matches per query.
+        nprobe (int): IVF lists to scan per query. Exact search when None or
+            when no ANN index has been built.
+        rescore (int): With `full_values`, rescore `rescore * k` candidates at
+            full precision. 0 returns the quantized scores as they are.
+
+        Returns:
+        -------
+        (list[list[dict]]): Matches for each query, best first.
+        """
+        queries = _normalize(queries)
+        if queries.shape[1] != self.dimension:
+            raise ValueError(f"Query has {queries.shape[1]} dimensions, index has {self.dimension}")
+        rescoring = self.full_values is not None and rescore
+        shortlist = k * rescore if rescoring else k
+
+        if self.ann is None or not nprobe:
+            scores = self.scores(queries).T * self.inverse_norms
+            candidates = [(np.arange(len(self)), row_scores) for row_scores in scores]
+        else:
+            candidates = []
+            for query in queries:
+                # Sorted rows keep reads from a memory-mapped matrix sequential
+                rows = np.sort(self.ann.candidates(query, nprobe))
+                candidates.append((rows, (self.rows(rows) @ query) * self.inverse_norms[rows]))
+
+        results = []
+        for query, (rows, scores) in zip(queries, candidates):
+            top = _top_k(scores[None, :], shortlist)[0]
+            if rescoring:
+                results.append(self._matches(*self._rescore(query, rows[top], k)))
+            else:
+                results.append(self._matches(rows[top], scores[top]))
+        return results
+
+
+def recall_at_k(exact, approximate):
+    """Mean fraction of the exact matches' IDs that the approximate search also returned."""
+    if not exact:
+        return 1.0
+    overlaps = [
+        len({m['id'] for m in e} & {m['id'] for m in a}) / len(e)
+        for e, a in zip(exact, approximate) if e
+    ]
+    return sum(overlaps) / len(overlaps) if overlaps else 1.0
+
+def quantization_report(index, dtypes=('float16', 'int8'), k=10, n_queries=100, rescore=RESCORE_FACTOR, seed=0):
+    """
+    Measures the size and recall@k of quantized copies of a full-precision index.
+
+    Queries are corpus rows sampled at random, compared against exact float32
+    search, with and without full-precision rescoring.
+
+    Returns:
+    -------
+    (list[dict]): One row per dtype with its bytes, compression ratio and recall.
+    """
+    rng = np.random.default_rng(seed)
+    queries = index.rows(np.sort(rng.choice(len(index), min(n_queries, len(index)), replace=False)))
+    exact = index.search(queries, k=k)
+    report = [{'dtype': str(index.values.dtype), 'bytes': index.nbytes, 'compression': 1.0,
+               'recall': 1.0, 'recall_rescored': 1.0}]
+    for dtype in dtypes:
+        quantized = index.quantize(dtype)
+        report.append({
+            'dtype': dtype,
+            'bytes': quantized.nbytes,
+            'compression': round(index.nbytes / quantized.nbytes, 2),
+            'recall': round(recall_at_k(exact, quantized.search(queries, k=k, rescore=0)), 4),
+            'recall_rescored': round(recall_at_k(exact, quantized.search(queries, k=k, rescore=rescore)), 4),
+        })
+    return report
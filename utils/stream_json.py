@@ -0,0 +1,77 @@
+import json
+import codecs
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = ' \t\n\r'
+
+def iter_json_array(fileobj, chunk_size=1 << 16):
+    """
+    Yields the elements of a top-level JSON array one at a time.
+
+    Reads `fileobj` (text or binary) in chunks, so memory stays proportional
+    to the largest single element rather than the whole file.
+    """
+    utf8 = codecs.getincrementaldecoder('utf-8')()
+    buf = ''
+    pos = 0
+    eof = False
+    read_size = chunk_size
+
+    def fill():
+        nonlocal buf, pos, eof
+        data = fileobj.read(read_size)
+        if not data:
+            eof = True
+            data = utf8.decode(b'', final=True)
+        elif isinstance(data, bytes):
+            data = utf8.decode(data)
+        # Drop what has already been consumed before appending
+        buf = buf[pos:] + data
+        pos = 0
+
+    def skip_whitespace():
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos] in _WHITESPACE:
+                pos += 1
+            if pos < len(buf) or eof:
+                return
+            fill()
+
+    skip_whitespace()
+    if pos >= len(buf) or buf[pos] != '[':
+        raise ValueError("Invalid JSON format - expected array of vectors")
+    pos += 1
+
+    expect_value = True
+    while True:
+        skip_whitespace()
+        if pos >= len(buf):
+            raise ValueError("Invalid JSON format - unterminated array")
+        if buf[pos] == ']':
+            return
+        if not expect_value:
+            if buf[pos] != ',':
+                raise ValueError(f"Invalid JSON format - expected ',' or ']' at offset {pos}")
+            pos += 1
+            expect_value = True
+            continue
+
+        try:
+            element, end = _decoder.raw_decode(buf, pos)
+            # An element running to the end of the buffer may be cut short (e.g. a number)
+            incomplete = end == len(buf) and not eof
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            incomplete = True
+        if incomplete:
+            # Grow reads while a single element spans several chunks
+            read_size = min(read_size * 2, 1 << 26)
+            fill()
+            continue
+
+        read_size = chunk_size
+        pos = end
+        expect_value = False
+        yield element
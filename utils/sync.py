@@ -0,0 +1,70 @@
+from itertools import groupby
+from utils.ids import url_prefix
+
+FETCH_BATCH_SIZE = 100
+DELETE_BATCH_SIZE = 1000
+
+def plan_sync(index, namespace, vectors):
+    """
+    Diffs local vectors against what an index namespace already holds for the same articles.
+
+    Params:
+    ------
+    index: Connected Pinecone index.
+    namespace (str): Namespace to compare against.
+    vectors (list[dict]): Local vectors with deterministic IDs (see utils.ids.chunk_id).
+
+    Returns:
+    -------
+    (dict): 'upsert' - new or changed vectors, 'delete' - IDs of stale vectors,
+        'unchanged' - number of vectors already up to date.
+    """
+    local = {vector['id']: vector for vector in vectors}
+    prefixes = {url_prefix(vector['metadata']['url']) for vector in vectors}
+
+    # Every chunk of an article shares its URL prefix, so list what the index holds per article
+    remote_ids = set()
+    for prefix in prefixes:
+        for ids in index.list(prefix=f'{prefix}#', namespace=namespace):
+            remote_ids.update(ids)
+
+    stale = sorted(remote_ids - local.keys())
+    existing = sorted(remote_ids & local.keys())
+
+    # Vectors whose chunk text is unchanged do not need to be sent again
+    unchanged = set()
+    for i in range(0, len(existing), FETCH_BATCH_SIZE):
+        fetched = index.fetch(ids=existing[i:i+FETCH_BATCH_SIZE], namespace=namespace).vectors
+        for vector_id, remote in fetched.items():
+            if (remote.metadata or {}) == local[vector_id]['metadata']:
+                unchanged.add(vector_id)
+
+    return {
+        'upsert': [vector for vector_id, vector in local.items() if vector_id not in unchanged],
+        'delete': stale,
+        'unchanged': len(unchanged)
+    }
+
+def delete_ids(index, namespace, ids):
+    for i in range(0, len(ids), DELETE_BATCH_SIZE):
+        index.delete(ids=ids[i:i+DELETE_BATCH_SIZE], namespace=namespace)
+
+def sync_articles(index, namespace, vectors, stats):
+    """
+    Streams the vectors that need upserting, planning one article at a time.
+
+    Exports keep each article's vectors together, so only one article is held
+    in memory. Stale vectors are deleted as each article is planned, and
+    `stats` accumulates the 'deleted' and 'unchanged' counts.
+    """
+    seen = set()
+    for url, article in groupby(vectors, key=lambda vector: vector['metadata']['url']):
+        # Planning an article twice would delete the vectors upserted for its first run
+        if url in seen:
+            raise ValueError(f"Vectors of article '{url}' are not contiguous; sync them from a single file")
+        seen.add(url)
+        plan = plan_sync(index, namespace, list(article))
+        delete_ids(index, namespace, plan['delete'])
+        stats['deleted'] += len(plan['delete'])
+        stats['unchanged'] += plan['unchanged']
+        yield from plan['upsert']
@@ -0,0 +1,120 @@
+import json
+import time
+import random
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from utils.metrics import METRICS
+
+# Pinecone rejects upsert requests above 2 MB or 1000 vectors
+MAX_REQUEST_BYTES = 2 * 1024 * 1024
+MAX_BATCH_VECTORS = 1000
+
+def payload_size(vector):
+    """Approximate serialized size of a vector in an upsert request."""
+    return len(json.dumps(vector, separators=(',', ':')).encode('utf-8'))
+
+def payload_batches(vectors, max_bytes=MAX_REQUEST_BYTES, max_vectors=MAX_BATCH_VECTORS):
+    """
+    Groups vectors into batches whose serialized payload stays under `max_bytes`.
+
+    Works on any iterable and only holds the batch being filled.
+    """
+    # Leave room for the request envelope and the namespace
+    budget = max_bytes - 1024
+    batch, batch_bytes = [], 0
+    for vector in vectors:
+        size = payload_size(vector) + 1
+        if batch and (batch_bytes + size > budget or len(batch) >= max_vectors):
+            yield batch
+            batch, batch_bytes = [], 0
+        batch.append(vector)
+        batch_bytes += size
+    if batch:
+        yield batch
+
+
+class Upserter:
+    """
+    Upserts vectors with several payload-sized batches in flight at once.
+
+    Each batch is retried on its own with exponential backoff, so one failing
+    request does not abort the others. Throughput is available from `stats()`.
+    """
+
+    def __init__(self, index, namespace, max_workers=4, max_retries=3, max_bytes=MAX_REQUEST_BYTES,
+                 metrics=None):
+        self.index = index
+        self.metrics = metrics or METRICS
+        self.namespace = namespace
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.max_bytes = max_bytes
+        self.upserted = 0
+        self.failed = []
+        self.elapsed = 0.0
+
+    def _upsert_batch(self, batch):
+        for attempt in range(self.max_retries + 1):
+            try:
+                with self.metrics.timer('api_latency_seconds', service='pinecone'):
+                    self.index.upsert(vectors=batch, namespace=self.namespace)
+                self.metrics.inc('vectors_upserted_total', len(batch))
+                return len(batch)
+            except Exception:
+                self.metrics.inc('api_errors_total', service='pinecone')
+                if attempt == self.max_retries:
+                    raise
+                self.metrics.inc('api_retries_total', service='pinecone')
+                delay = min(30, 2 ** attempt) + random.random()
+                self.metrics.inc('backoff_seconds_total', delay, service='pinecone')
+                time.sleep(delay)
+
+    def upsert(self, vectors, on_batch=None):
+        """
+        Upserts every vector from an iterable.
+
+        Params:
+        ------
+        vectors (Iterable[dict]): Pinecone-style vector dicts.
+        on_batch (callable): Called with the running upserted count after each batch.
+
+        Returns:
+        -------
+        (int): Number of vectors upserted by this call.
+        """
+        start = time.perf_counter()
+        upserted = 0
+        in_flight = {}
+
+        def collect(done):
+            nonlocal upserted
+            for future in done:
+                batch = in_flight.pop(future)
+                try:
+                    upserted += future.result()
+                except Exception as e:
+                    # Keep going; failed batches are reported for a retry of just those vectors
+                    self.failed.append((batch, str(e)))
+                    continue
+                if on_batch:
+                    on_batch(self.upserted + upserted)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for batch in payload_batches(vectors, self.max_bytes):
+                # Bound the queue so the producer never runs far ahead of the network
+                if len(in_flight) >= self.max_workers * 2:
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    collect(done)
+                in_flight[executor.submit(self._upsert_batch, batch)] = batch
+            collect(wait(in_flight).done)
+
+        self.upserted += upserted
+        self.elapsed += time.perf_counter() - start
+        return upserted
+
+    def stats(self):
+        return {
+            'upserted': self.upserted,
+            'failed': sum(len(batch) for batch, _ in self.failed),
+            'seconds': round(self.elapsed, 2),
+            'vectors_per_second': round(self.upserted / self.elapsed, 1) if self.elapsed else 0.0
+        }
@@ -0,0 +1,155 @@
+import json
+import time
+import numpy as np
+from utils.stream_json import iter_json_array
+from utils.vector_store import load_values, iter_metadata
+
+# Pinecone rejects vectors whose metadata serializes to more than 40 KB
+MAX_METADATA_BYTES = 40 * 1024
+
+# Example IDs kept per problem in the report
+MAX_EXAMPLES = 5
+
+PROBLEMS = ('missing_fields', 'wrong_dimension', 'non_finite', 'zero_norm', 'duplicate_id', 'metadata_too_large')
+
+def _metadata_bytes(metadata):
+    return len(json.dumps(metadata, separators=(',', ':'), ensure_ascii=False).encode('utf-8'))
+
+# Rows converted to float32 and checked at a time, so memory stays flat on large files
+BLOCK_ROWS = 1024
+
+def _check_rows(block, scales=None):
+    """Finiteness and zero-norm flags of a block of rows of the expected dimension."""
+    block = np.asarray(block, dtype=np.float32)
+    if scales is not None:
+        block = block * scales[:, None]
+    finite = np.isfinite(block).all(axis=1)
+    norms = np.einsum('ij,ij->i', block, block, dtype=np.float64)
+    return finite, finite & (norms == 0)
+
+def _read_json(source, dimension):
+    """One pass over a JSON export: IDs, metadata sizes and row checks of the vectors of the expected dimension."""
+    ids, sizes, lengths, missing = [], [], [], []
+    finite, zero = [], []
+    block = []
+    source.seek(0)
+    for position, vector in enumerate(iter_json_array(source)):
+        if not isinstance(vector, dict) or 'id' not in vector or not isinstance(vector.get('values'), list):
+            missing.append(str(vector.get('id', f'#{position}')) if isinstance(vector, dict) else f'#{position}')
+            continue
+        values = vector['values']
+        if dimension is None:
+            dimension = len(values)
+        ids.append(str(vector['id']))
+        sizes.append(_metadata_bytes(vector.get('metadata') or {}))
+        lengths.append(len(values))
+        if len(values) == dimension:
+            block.append(values)
+            if len(block) == BLOCK_ROWS:
+                for flags, result in zip((finite, zero), _check_rows(block)):
+                    flags.append(result)
+                block = []
+    if block:
+        for flags, result in zip((finite, zero), _check_rows(block)):
+            flags.append(result)
+    finite = np.concatenate(finite) if finite else np.ones(0, dtype=bool)
+    zero = np.concatenate(zero) if zero else np.zeros(0, dtype=bool)
+    return ids, np.array(sizes), np.array(lengths), finite, zero, dimension, missing
+
+def _read_npy(source, dimension):
+    values = load_values(source['npy'])
+    scales = load_values(source['scale']) if source.get('scale') is not None else None
+    ids, sizes = [], []
+    for record in iter_metadata(source['meta']):
+        ids.append(str(record['id']))
+        sizes.append(_metadata_bytes(record.get('metadata') or {}))
+    if len(ids) != len(values):
+        raise ValueError(f"{source['name']} has {len(values)} rows but its metadata table has {len(ids)} records")
+    row_dimension = values.shape[1] if values.ndim == 2 else 0
+    if dimension is None:
+        dimension = row_dimension
+    lengths = np.full(len(ids), row_dimension)
+    finite, zero = [np.ones(0, dtype=bool)], [np.zeros(0, dtype=bool)]
+    if row_dimension == dimension:
+        for begin in range(0, len(values), BLOCK_ROWS):
+            rows = slice(begin, begin + BLOCK_ROWS)
+            block_finite, block_zero = _check_rows(values[rows], None if scales is None else scales[rows])
+            finite.append(block_finite)
+            zero.append(block_zero)
+    return ids, np.array(sizes), lengths, np.concatenate(finite), np.concatenate(zero), dimension, []
+
+def validate_sources(sources, dimension=None, max_metadata_bytes=MAX_METADATA_BYTES):
+    """
+    Checks every vector of the upload sources before anything is sent to Pinecone.
+
+    Each source is read once. Finiteness and norms are checked in float32
+    blocks of BLOCK_ROWS as the file streams, so memory stays flat; the
+    dimension, duplicate-ID and metadata-size checks run over the whole file.
+
+    Params:
+    ------
+    sources (list[dict]): Upload sources as built by `database_tool.group_uploads`.
+    dimension (int): Expected vector size; defaults to the size of each source's first vector,
+        so sources of different sizes (see `Embedder.output_dimensions`) can be checked together.
+    max_metadata_bytes (int): Largest serialized metadata accepted per vector.
+
+    Returns:
+    -------
+    (dict): 'ok', 'vectors', 'dimensions' (source name -> dimension), 'seconds' and,
+        per problem in PROBLEMS, {'count', 'examples'} with (source name, vector ID) examples.
+    """
+    start = time.perf_counter()
+    problems = {name: {'count': 0, 'examples': []} for name in PROBLEMS}
+
+    def record(problem, source_name, ids):
+        problems[problem]['count'] += len(ids)
+        room = MAX_EXAMPLES - len(problems[problem]['examples'])
+        problems[problem]['examples'] += [(source_name, vector_id) for vector_id in ids[:max(0, room)]]
+
+    all_ids, all_dimensions, id_sources = [], [], []
+    dimensions = {}
+    total = 0
+    for source in sources:
+        if 'json' in source:
+            ids, sizes, lengths, finite, zero, expected, missing = _read_json(source['json'], dimension)
+        else:
+            ids, sizes, lengths, finite, zero, expected, missing = _read_npy(source, dimension)
+        dimensions[source['name']] = expected
+        total += len(ids) + len(missing)
+        record('missing_fields', source['name'], missing)
+        ids = np.array(ids, dtype=object)
+
+        wrong = lengths != expected
+        record('wrong_dimension', source['name'], list(ids[wrong]))
+        # Row checks cover the vectors of the right dimension, in order
+        checked = ids[~wrong]
+        record('non_finite', source['name'], list(checked[~finite]))
+        record('zero_norm', source['name'], list(checked[zero]))
+        record('metadata_too_large', source['name'], list(ids[sizes > max_metadata_bytes]))
+
+        all_ids.append(ids)
+        all_dimensions.append(np.full(len(ids), expected or 0))
+        id_sources += [source['name']] * len(ids)
+
+    if all_ids:
+        # IDs only collide within one dimension; each size goes to its own namespace.
+        # The numeric dimension ends at the first ':', so keys cannot run into each other
+        ids = np.concatenate(all_ids).astype(str)
+        keys = np.char.add(np.char.add(np.concatenate(all_dimensions).astype(str), ':'), ids)
+        unique, first, counts = np.unique(keys, return_index=True, return_counts=True)
+        duplicated = np.isin(keys, unique[counts > 1])
+        # The first occurrence of an ID is fine; every later one would overwrite it
+        duplicated[first] = False
+        positions = np.flatnonzero(duplicated)
+        problems['duplicate_id']['count'] = len(positions)
+        problems['duplicate_id']['examples'] = [
+            (id_sources[i], str(ids[i])) for i in positions[:MAX_EXAMPLES]
+        ]
+
+    return {
+        'ok': not any(problem['count'] for problem in problems.values()),
+        'vectors': total,
+        'dimensions': dimensions,
+        'seconds': round(time.perf_counter() - start, 3),
+        **problems
+    }
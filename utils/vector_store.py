@@ -0,0 +1,138 @@
+import io
+import os
+import json
+import numpy as np
+
+# A vector file pairs a matrix with a metadata table holding one JSON line per row.
+# The matrix is float32, float16, or int8 with a float32 scale per row in `<stem>.scale.npy`.
+VALUES_SUFFIX = '.npy'
+META_SUFFIX = '.meta.jsonl'
+SCALE_SUFFIX = '.scale.npy'
+VECTOR_DTYPES = ('float32', 'float16', 'int8')
+
+def is_values_file(name):
+    return name.endswith(VALUES_SUFFIX) and not name.endswith(SCALE_SUFFIX)
+
+def quantize(values, dtype):
+    """
+    Converts a float matrix to `dtype`.
+
+    Returns:
+    -------
+    (tuple[np.ndarray, np.ndarray | None]): The converted matrix and, for int8,
+        the per-row scales that `dequantize` multiplies back in.
+    """
+    values = np.asarray(values, dtype=np.float32)
+    if dtype == 'float32':
+        return values, None
+    if dtype == 'float16':
+        return values.astype(np.float16), None
+    if dtype != 'int8':
+        raise ValueError(f"Unsupported vector dtype '{dtype}', expected one of {VECTOR_DTYPES}")
+    # Each row is scaled so its largest component maps to ±127
+    scales = (np.abs(values).max(axis=1) / 127).astype(np.float32) if len(values) else np.zeros(0, np.float32)
+    safe = np.where(scales == 0, 1, scales)[:, None]
+    return np.clip(np.rint(values / safe), -127, 127).astype(np.int8), scales
+
+def dequantize(values, scales=None):
+    """Float32 copy of (a block of) a stored matrix."""
+    values = np.asarray(values, dtype=np.float32)
+    return values * scales[:, None] if scales is not None else values
+
+def truncate_embeddings(values, dimensions):
+    """
+    Derives shorter embeddings from full-size ones in one vectorized step.
+
+    text-embedding-3 vectors keep their meaning when cut to their first
+    components, as long as the cut vectors are renormalized to unit length.
+
+    Returns:
+    -------
+    (dict[int, np.ndarray]): Unit-length (n, d) float32 matrix for each d in `dimensions`.
+    """
+    values = np.asarray(values, dtype=np.float32)
+    if values.size == 0:
+        # A job whose chunks were all skipped has nothing to truncate
+        return {d: np.empty((0, d), dtype=np.float32) for d in dimensions}
+    if max(dimensions) > values.shape[1]:
+        raise ValueError(f"Cannot derive {max(dimensions)} dimensions from {values.shape[1]}-dimensional vectors")
+    # Norms of every prefix, so each truncation is one division
+    prefix_norms = np.sqrt(np.cumsum(np.square(values), axis=1))
+    variants = {}
+    for d in dimensions:
+        norms = prefix_norms[:, d - 1:d]
+        variants[d] = values[:, :d] / np.where(norms == 0, 1, norms)
+    return variants
+
+def write_vectors(stem, vectors, dtype='float32'):
+    """
+    Writes Pinecone-style vector dicts as `<stem>.npy` and `<stem>.meta.jsonl`,
+    plus `<stem>.scale.npy` when `dtype` is int8.
+
+    Returns:
+    -------
+    (list[str]): Paths of the files written.
+    """
+    values, scales = quantize([vector['values'] for vector in vectors], dtype)
+    np.save(stem + VALUES_SUFFIX, values)
+    paths = [stem + VALUES_SUFFIX, stem + META_SUFFIX]
+    if scales is not None:
+        np.save(stem + SCALE_SUFFIX, scales)
+        paths.append(stem + SCALE_SUFFIX)
+    with open(stem + META_SUFFIX, 'w') as f:
+        for vector in vectors:
+            f.write(json.dumps({'id': vector['id'], 'metadata': vector['metadata']}) + '\n')
+    return paths
+
+def load_values(source):
+    """
+    Opens a float32 `.npy` matrix without copying it.
+
+    Paths are memory-mapped; in-memory uploads (anything with `getbuffer`) are
+    viewed in place with `np.frombuffer`.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        return np.load(source, mmap_mode='r')
+
+    buffer = source.getbuffer()
+    stream = io.BytesIO(memoryview(buffer)[:65536].tobytes())
+    version = np.lib.format.read_magic(stream)
+    if version == (1, 0):
+        shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(stream)
+    else:
+        shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(stream)
+    if fortran_order:
+        raise ValueError("Fortran-ordered vector files are not supported")
+    return np.frombuffer(buffer, dtype=dtype, count=int(np.prod(shape)), offset=stream.tell()).reshape(shape)
+
+def iter_metadata(source):
+    """Yields the {'id', 'metadata'} records of a `.meta.jsonl` path or file object."""
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'r') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        return
+
+    source.seek(0)
+    for line in source:
+        if line.strip():
+            yield json.loads(line)
+
+def iter_vectors(values_source, meta_source, scale_source=None):
+    """Yields Pinecone-style vector dicts, converting one matrix row at a time."""
+    values = load_values(values_source)
+    scales = load_values(scale_source) if scale_source is not None else None
+    if values.dtype == np.int8 and scales is None:
+        raise ValueError("int8 vector file needs its .scale.npy table")
+    count = 0
+    for record in iter_metadata(meta_source):
+        if count >= len(values):
+            raise ValueError(f"Metadata table has more records than the {len(values)} vector rows")
+        row = values[count].astype(np.float32)
+        if scales is not None:
+            row *= scales[count]
+        yield {'id': record['id'], 'metadata': record['metadata'], 'values': row.tolist()}
+        count += 1
+    if count != len(values):
+        raise ValueError(f"Vector file has {len(values)} rows but its metadata table has {count} records")